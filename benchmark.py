@@ -0,0 +1,436 @@
+"""Benchmark the OLX parser on synthetic result pages.
+
+Generates OLX-like search result pages of a given size and layout, times
+each stage of the parser on them and compares the numbers with a saved
+baseline:
+
+    python benchmark.py --cards 50 500 2000 --save-baseline bench_baseline.json
+    python benchmark.py --cards 50 500 2000 --compare bench_baseline.json
+
+bench_baseline.json holds a baseline recorded with the default options.
+Listing counts and extraction paths carry over between machines; for
+timings, save a baseline on your own machine first.
+
+It can also stand in for OLX as a local HTTP server, to exercise fetching
+and search API pagination:
+
+    python benchmark.py --serve 8000 [--fixtures DIR] [--fail-every 5]
+
+Files in a fixtures directory named after a URL-quoted path and query (see
+recorded_name) replay a recorded response for exactly that request.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from query_File import (
+    EnhancedOLXParser, ListingSink, resolve_parser_backend,
+)
+
+VARIANTS = ['itembox', 'classes', 'links', 'state']
+# Stage timings come from the parser's own metrics; 'other' is the rest of
+# the parse (opening the page and settling lazily read card fields)
+STAGES = ['classify', 'read', 'parse', 'index', 'json_scripts', 'selectors', 'dedup', 'other', 'save']
+DEFAULT_REGRESSION_TOLERANCE = 0.25
+
+TITLE_WORDS = ['Car', 'cover', 'for', 'Swift', 'Dzire', 'Alto', 'waterproof', 'premium',
+               'body', 'full', 'silver', 'heavy', 'duty', 'dust', 'proof', 'new']
+LOCATIONS = ['Andheri East, Mumbai', 'Kothrud, Pune', 'Dwarka, Delhi', 'Whitefield, Bengaluru']
+DATES = ['Today', 'Yesterday', '3 days ago', 'Jan 05', '12 Feb 2024']
+API_PAGE_PATH = '/api/relevance/v4/search?query=car+cover&page={page}'
+
+def synthetic_ads(n_cards, seed=1, start=0):
+    """Ad dicts shaped like the items of OLX's __INITIAL_STATE__"""
+    rng = random.Random(seed)
+    ads = []
+    for i in range(start, start + n_cards):
+        price = rng.randint(200, 25000)
+        ads.append({
+            'id': str(1700000000 + i),
+            'title': ' '.join(rng.sample(TITLE_WORDS, 6)) + f" {i}",
+            'price': {'value': {'raw': price, 'display': f"₹ {price:,}"}},
+            'locations_resolved': {'ADMIN_LEVEL_3_name': rng.choice(LOCATIONS)},
+            'display_date': rng.choice(DATES),
+            'images': [{'url': f"https://apollo.olxcdn.com/v1/files/{i}-IN/image"}],
+        })
+    return ads
+
+def render_card(ad, variant):
+    """Card markup for one ad; each variant is picked up by a different strategy"""
+    price = ad['price']['value']['display']
+    location = ad['locations_resolved']['ADMIN_LEVEL_3_name']
+    link = card_path(ad)
+    image = ad['images'][0]['url']
+    if variant == 'itembox':
+        return (
+            f'<li class="_1DNjI"><div data-aut-id="itemBox" class="_3V_Ww"><a href="{link}">'
+            f'<figure class="_3UrC5"><img src="{image}" alt="{ad["title"]}"></figure>'
+            f'<div class="_2Vp0i"><span class="_89yzn" data-aut-id="itemPrice">{price}</span>'
+            f'<span class="_2poNJ" data-aut-id="itemTitle">{ad["title"]}</span>'
+            f'<div class="_3rmDx"><span class="_2VQu4" data-aut-id="item-location">{location}</span>'
+            f'<span class="_2jcGx"><span data-aut-id="item-date">{ad["display_date"]}</span></span>'
+            f'</div></div></a></div></li>'
+        )
+    if variant == 'classes':
+        # No itemBox markers: found by the repeated-class strategy
+        return (
+            f'<div class="listing-card"><a href="{link}"><img src="{image}"></a>'
+            f'<h3 class="title">{ad["title"]}</h3><span class="price">{price}</span>'
+            f'<span class="location">{location}</span><span class="date">{ad["display_date"]}</span></div>'
+        )
+    if variant == 'links':
+        # No repeated container classes: found through item links
+        return (
+            f'<li class="c{ad["id"]}"><a href="{link}"><h4>{ad["title"]}</h4></a>'
+            f'<span class="price">{price}</span><span class="location">{location}</span></li>'
+        )
+    return ''
+
+def generate_page(n_cards, variant='itembox', state=False, noise=20, seed=1, next_page_url=None):
+    """HTML of a synthetic OLX result page.
+
+    variant picks the card markup (see VARIANTS; 'state' has no cards and
+    only the embedded state), state embeds a window.__INITIAL_STATE__ blob
+    with the same ads (and next_page_url, if given) and noise adds
+    unrelated divs around the results. No noise class repeats more than
+    twice, so the repeated-class strategy still finds the cards.
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown variant '{variant}', expected one of: {', '.join(VARIANTS)}")
+    ads = synthetic_ads(n_cards, seed)
+
+    state_script = ''
+    if state or variant == 'state':
+        blob = {
+            'config': {'locale': 'en-IN', 'note': 'braces }; in strings must not end the state'},
+            'states': {'items': {'elements': {ad['id']: ad for ad in ads}}},
+        }
+        if next_page_url:
+            blob['states']['searches'] = {'metadata': {'next_page_url': next_page_url}}
+        state_script = f"<script>window.__INITIAL_STATE__ = {json.dumps(blob, ensure_ascii=False)};</script>"
+
+    noise_html = ''.join(
+        f'<div class="rui-{j // 2}"><p>Sponsored {j}</p><span>{"x" * (j % 40)}</span></div>'
+        for j in range(noise)
+    )
+    cards = ''.join(render_card(ad, variant) for ad in ads)
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        '<title>Car Cover in India | OLX</title>'
+        '<link rel="canonical" href="https://www.olx.in/items/q-car-cover">'
+        f'{state_script}</head><body><header class="_1Yz5T"><a href="/">OLX</a></header>'
+        f'<main>{noise_html}<ul class="rl3f9 _3mXOU">{cards}</ul></main>'
+        '<footer><a href="/help">Help</a><a href="/sitemap">Sitemap</a></footer></body></html>'
+    )
+
+def generate_api_page(n_cards, page, pages, seed=1):
+    """JSON body of one search API page; the last of pages has no next_page_url"""
+    next_page_url = API_PAGE_PATH.format(page=page + 1) if page + 1 < pages else None
+    return json.dumps({
+        'data': synthetic_ads(n_cards, seed + page, start=page * n_cards),
+        'metadata': {'next_page_url': next_page_url, 'page': page},
+    }, ensure_ascii=False)
+
+def generate_detail_page(ad, seller='Rahul Motors'):
+    """HTML of an ad's detail page, with the ad and its seller in the page state"""
+    user_id = f"u{ad['id']}"
+    detail = dict(ad, user_id=user_id, description=f"{ad['title']}. Fits most hatchbacks, barely used.",
+                  created_at_first='2024-02-12T10:15:00+05:30',
+                  images=[{'url': image['url'], 'full': {'url': image['url'] + ';s=1080x1080'}}
+                          for image in ad['images']])
+    blob = {'states': {'items': {'elements': {ad['id']: detail}},
+                       'users': {'elements': {user_id: {'id': user_id, 'name': seller}}}}}
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        f'<title>{ad["title"]} | OLX</title>'
+        f'<script>window.__INITIAL_STATE__ = {json.dumps(blob, ensure_ascii=False)};</script>'
+        f'</head><body><h1 data-aut-id="itemTitle">{ad["title"]}</h1>'
+        f'<div data-aut-id="itemDescriptionContent"><p>{detail["description"]}</p></div>'
+        '</body></html>'
+    )
+
+def card_path(ad):
+    return f"/item/{ad['title'].lower().replace(' ', '-')}-iid-{ad['id']}"
+
+def recorded_name(path):
+    """Fixture file name that replays the response for a request path (with query)"""
+    return quote(path, safe='')
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def time_stages(html_file, parser_backend, output_dir):
+    """Parse html_file with parse_html_file and save the listings.
+
+    Returns (seconds per stage, listings, extraction path); the stages are
+    the parser's metrics, so the parse is timed exactly as it runs.
+    """
+    parser = EnhancedOLXParser(html_file, diagnostics=False, parser_backend=parser_backend,
+                               learn_templates=True, metrics=True)
+    listings = parser.parse_html_file()
+    measured = parser.metrics.timings
+    timings = {stage: measured.get(stage, 0.0) for stage in STAGES if stage not in ('other', 'save')}
+    timings['other'] = max(measured.get('total', 0.0) - sum(timings.values()), 0.0)
+
+    started = time.perf_counter()
+    prefix = os.path.join(output_dir, 'bench')
+    with ListingSink(f'{prefix}.jsonl', f'{prefix}.csv') as sink:
+        for listing in listings:
+            sink.write(listing)
+    timings['save'] = time.perf_counter() - started
+    for suffix in ('.jsonl', '.csv'):
+        os.remove(prefix + suffix)
+
+    return timings, len(listings), parser.strategy_path
+
+def run_case(case, parser_backend, repeat):
+    """Benchmark one generated page in this (fresh) process; best time of repeat runs per stage"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        html_file = os.path.join(output_dir, f"{case['name']}.html")
+        with open(html_file, 'w', encoding='utf-8') as f:
+            f.write(generate_page(case['cards'], case['variant'], case['state'], case['noise']))
+
+        best = {}
+        listings = 0
+        path = None
+        for _ in range(repeat):
+            timings, listings, path = time_stages(html_file, parser_backend, output_dir)
+            for stage, seconds in timings.items():
+                best[stage] = min(best.get(stage, seconds), seconds)
+
+        total = sum(best.values())
+        size_mb = os.path.getsize(html_file) / (1024 * 1024)
+
+    return {
+        'name': case['name'],
+        'cards': case['cards'],
+        'listings': listings,
+        'path': path,
+        'size_mb': round(size_mb, 3),
+        'stages': {stage: round(best[stage], 6) for stage in STAGES},
+        'total': round(total, 6),
+        'listings_per_s': round(listings / total, 1) if total else None,
+        'mb_per_s': round(size_mb / total, 2) if total else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+def build_cases(card_counts, variants, state, noise):
+    cases = []
+    for variant in variants:
+        for cards in card_counts:
+            name = f"{variant}{'+state' if state and variant != 'state' else ''}-{cards}"
+            cases.append({'name': name, 'cards': cards, 'variant': variant,
+                          'state': state, 'noise': noise})
+    return cases
+
+def run_benchmarks(cases, parser_backend='auto', repeat=3):
+    """Run each case in its own worker process so peak RSS is per case"""
+    parser_backend = resolve_parser_backend(parser_backend)
+    results = []
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(run_case, case, parser_backend, repeat).result()
+        results.append(result)
+        print_result(result)
+    return results
+
+def print_result(result):
+    stages = '  '.join(f"{stage} {result['stages'][stage] * 1000:8.1f}" for stage in STAGES)
+    print(f"{result['name']:<22} {result['listings']:>6} listings ({result['path']})  {stages}  "
+          f"total {result['total'] * 1000:8.1f} ms  {result['listings_per_s']:>9} listings/s  "
+          f"{result['mb_per_s']:>6} MB/s  peak {result['peak_rss_mb']} MB")
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_REGRESSION_TOLERANCE):
+    """Print per-stage changes against a baseline; returns the regressed (case, stage) pairs"""
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    print(f"\nComparison with baseline from {baseline.get('created_at', 'unknown')} "
+          f"(regression above +{tolerance:.0%}):")
+    for result in results:
+        old = previous.get(result['name'])
+        if old is None:
+            print(f"- {result['name']}: not in baseline")
+            continue
+        changes = []
+        for stage in STAGES + ['total']:
+            if stage != 'total' and stage not in old['stages']:
+                continue  # stage added since the baseline was saved
+            new_seconds = result['stages'][stage] if stage != 'total' else result['total']
+            old_seconds = old['stages'][stage] if stage != 'total' else old['total']
+            if not old_seconds:
+                continue
+            change = new_seconds / old_seconds - 1
+            flag = ''
+            # Sub-millisecond stages are too noisy to call regressions
+            if change > tolerance and new_seconds - old_seconds > 0.001:
+                regressions.append((result['name'], stage))
+                flag = ' REGRESSION'
+            changes.append(f"{stage} {change:+.0%}{flag}")
+        if result['listings'] != old['listings']:
+            changes.append(f"listings {old['listings']} -> {result['listings']}")
+            regressions.append((result['name'], 'listings'))
+        if result['path'] != old.get('path', result['path']):
+            changes.append(f"path {old['path']} -> {result['path']}")
+            regressions.append((result['name'], 'path'))
+        print(f"- {result['name']}: {', '.join(changes)}")
+    return regressions
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    """Serves fixture pages like a web server would: keep-alive, ETag and
+    Last-Modified validators, optional latency and injected 503 failures"""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    fail_every = 0
+    served = 0
+
+    def translate_path(self, path):
+        recorded = os.path.join(self.directory, recorded_name(path))
+        if os.path.isfile(recorded):
+            return recorded
+        return super().translate_path(path)
+
+    def send_head(self):
+        cls = type(self)
+        cls.served += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_every and cls.served % self.fail_every == 0:
+            self.send_error(503, "Injected failure")
+            return None
+
+        self.etag = None
+        path = self.translate_path(self.path)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self.etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+            if self.headers.get('If-None-Match') == self.etag:
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+        return super().send_head()
+
+    def end_headers(self):
+        if getattr(self, 'etag', None):
+            self.send_header('ETag', self.etag)
+            self.etag = None
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_fixtures(port, directory=None, cards=(50, 500), latency=0.0, fail_every=0, api_pages=3):
+    """Serve a directory of fixture pages (or generated pages) on localhost until interrupted.
+
+    Generated itembox and state pages link to api_pages pages of a search
+    API through their page state, and every card links to a detail page.
+    """
+    with tempfile.TemporaryDirectory() as generated:
+        if directory is None:
+            directory = generated
+            first_api_page = API_PAGE_PATH.format(page=1) if api_pages > 1 else None
+            for variant in VARIANTS:
+                for n_cards in cards:
+                    with open(os.path.join(directory, f"{variant}-{n_cards}.html"), 'w', encoding='utf-8') as f:
+                        f.write(generate_page(n_cards, variant, state=variant == 'itembox',
+                                              next_page_url=first_api_page))
+            for page in range(1, api_pages):
+                path = os.path.join(directory, recorded_name(API_PAGE_PATH.format(page=page)))
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(generate_api_page(max(cards), page, api_pages))
+            os.makedirs(os.path.join(directory, 'item'))
+            for ad in synthetic_ads(max(cards)):
+                with open(os.path.join(directory, card_path(ad).lstrip('/')), 'w', encoding='utf-8') as f:
+                    f.write(generate_detail_page(ad))
+
+        FixtureRequestHandler.latency = latency
+        FixtureRequestHandler.fail_every = fail_every
+        handler = partial(FixtureRequestHandler, directory=directory)
+        with ThreadingHTTPServer(('127.0.0.1', port), handler) as server:
+            print(f"Serving {directory} on http://127.0.0.1:{port}/")
+            for name in sorted(os.listdir(directory)):
+                print(f"  http://127.0.0.1:{port}/{name}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the OLX parser on synthetic pages")
+    parser.add_argument('--cards', type=int, nargs='+', default=[50, 500, 2000],
+                        help="cards per generated page (default: 50 500 2000)")
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=VARIANTS,
+                        help="page layouts: itembox cards, repeated-class cards, item links "
+                             "or embedded state only (default: all)")
+    parser.add_argument('--state', action='store_true',
+                        help="also embed the ads as window.__INITIAL_STATE__ in card layouts")
+    parser.add_argument('--noise', type=int, default=200,
+                        help="unrelated divs around the results (default: 200)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="runs per case; the best time of each stage is kept (default: 3)")
+    parser.add_argument('--backend', default='auto',
+                        help="BeautifulSoup parser backend (default: auto)")
+    parser.add_argument('--save-baseline', metavar='PATH',
+                        help="write the results as a baseline for later --compare runs")
+    parser.add_argument('--compare', metavar='PATH',
+                        help="compare with a saved baseline; exits with status 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_REGRESSION_TOLERANCE,
+                        help="slowdown counted as a regression (default: 0.25)")
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help="instead of benchmarking, serve fixture pages on localhost:PORT")
+    parser.add_argument('--fixtures', metavar='DIR',
+                        help="directory to serve with --serve (default: generated pages)")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds the stand-in server waits before each answer")
+    parser.add_argument('--fail-every', type=int, default=0, metavar='N',
+                        help="make the stand-in server answer every Nth request with 503")
+    parser.add_argument('--api-pages', type=int, default=3,
+                        help="search result pages the stand-in server offers, the first being "
+                             "the HTML page (default: 3)")
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.serve:
+        serve_fixtures(args.serve, args.fixtures, args.cards, args.latency, args.fail_every,
+                       args.api_pages)
+        return 0
+
+    cases = build_cases(args.cards, args.variants, args.state, args.noise)
+    print(f"Running {len(cases)} benchmark cases ({args.backend} backend, best of {args.repeat}); "
+          f"stage times in ms")
+    results = run_benchmarks(cases, args.backend, args.repeat)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(),
+                'backend': resolve_parser_backend(args.backend),
+                'python': sys.version.split()[0],
+                'results': results,
+            }, f, indent=2)
+        print(f"\nBaseline saved: {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_with_baseline(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,182 +1,2330 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
+from bs4.builder import builder_registry
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from html.parser import HTMLParser
+import argparse
+import asyncio
+import bz2
+import collections
+import collections.abc
+import codecs
+import contextlib
+import email
+import email.policy
+import glob
+import gzip
+import hashlib
+import http.client
+import io
+import itertools
 import json
 import csv
+import mmap
+import multiprocessing
+import queue
 import re
-from datetime import datetime
+import soupsieve
+import sqlite3
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+from array import array
+from datetime import date, datetime, timedelta
+from urllib.parse import urljoin, urlsplit
 import os
 
+try:
+    import numpy as np
+except ImportError:  # Only needed for ListingColumns statistics
+    np = None
+
+# Tree builders BeautifulSoup can use, fastest first (html5lib is the
+# slowest by far). 'auto' picks the fastest one that is installed.
+PARSER_BACKENDS = ['lxml', 'html.parser', 'html5lib']
+
+def resolve_parser_backend(backend):
+    """Map a parser backend name to an installed BeautifulSoup tree builder"""
+    if backend == 'auto':
+        for candidate in PARSER_BACKENDS:
+            if builder_registry.lookup(candidate):
+                return candidate
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend '{backend}', expected one of: auto, {', '.join(PARSER_BACKENDS)}")
+    if not builder_registry.lookup(backend):
+        raise ValueError(f"Parser backend '{backend}' is not installed (pip install {backend})")
+    return backend
+
+class PageMetrics:
+    """Stage timings and event counters collected while parsing one page.
+
+    Stages are timed with `with metrics.stage(name):`, or by wrapping a
+    generator in metrics.timed(name, ...), which only counts the time spent
+    producing items. DISABLED_METRICS stands in when metrics are off: it is
+    falsy and all of its methods are no-ops, so hot loops guard their
+    counting with `if metrics:` and pay nothing.
+    """
+
+    def __init__(self, page=None):
+        self.page = page
+        self.timings = {}
+        self.counters = {}
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def timed(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - started)
+                return
+            self.add_time(name, time.perf_counter() - started)
+            yield item
+
+    def as_dict(self):
+        return {
+            'page': self.page,
+            'timings': {name: round(seconds, 6) for name, seconds in self.timings.items()},
+            'counters': dict(self.counters),
+        }
+
+class DisabledMetrics(PageMetrics):
+    """No-op PageMetrics used when instrumentation is switched off"""
+
+    def __bool__(self):
+        return False
+
+    def count(self, name, n=1):
+        pass
+
+    def add_time(self, name, seconds):
+        pass
+
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+    def timed(self, name, iterable):
+        return iterable
+
+    def as_dict(self):
+        return {}
+
+DISABLED_METRICS = DisabledMetrics()
+
+class MetricsWriter:
+    """Write per-page metrics as JSON lines and/or totals as a Prometheus textfile.
+
+    The textfile is rewritten atomically on close, for node_exporter's
+    textfile collector.
+    """
+
+    PREFIX = 'olx_parser'
+
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_file = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+        self.prometheus_path = prometheus_path
+        self.pages = 0
+        self.timings = {}
+        self.counters = {}
+
+    def write(self, page_metrics):
+        if not page_metrics:
+            return
+        self.pages += 1
+        for name, seconds in page_metrics['timings'].items():
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+        for name, value in page_metrics['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        if self.jsonl_file:
+            self.jsonl_file.write(json.dumps(page_metrics, ensure_ascii=False) + '\n')
+
+    def prometheus_text(self):
+        prefix = self.PREFIX
+        lines = [
+            f"# HELP {prefix}_pages_total Pages parsed.",
+            f"# TYPE {prefix}_pages_total counter",
+            f"{prefix}_pages_total {self.pages}",
+            f"# HELP {prefix}_stage_seconds_total Time spent in each parser stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {seconds:.6f}'
+                  for name, seconds in sorted(self.timings.items())]
+        lines += [
+            f"# HELP {prefix}_events_total Parser events (elements scanned, selectors tried, ...).",
+            f"# TYPE {prefix}_events_total counter",
+        ]
+        lines += [f'{prefix}_events_total{{event="{name}"}} {value}'
+                  for name, value in sorted(self.counters.items())]
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        if self.jsonl_file:
+            self.jsonl_file.close()
+        if self.prometheus_path:
+            temp_path = f"{self.prometheus_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus_text())
+            os.replace(temp_path, self.prometheus_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Bytes decoded per feed() in streaming mode
+STREAM_CHUNK_SIZE = 1 << 20
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+def sniff_encoding(head):
+    """Encoding declared by a byte order mark or <meta charset>, else None"""
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    match = META_CHARSET.search(head)
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return None
+
+ASCII_PROBE = '<a href="x">'
+
+class PageSource:
+    """Bytes of a saved page plus its sniffed encoding.
+
+    The tree builder gets one bytes copy of the page with the encoding as
+    a hint (BeautifulSoup reads file-like input whole anyway). Regex scans
+    of pages in ASCII-compatible encodings run on the buffer (bytes or
+    memory map) directly; other pages are decoded for them. Pages without
+    a BOM or meta charset are checked chunk by chunk for valid utf-8 and
+    otherwise read as windows-1252.
+    """
+
+    def __init__(self, data, name='<memory>', encoding=None):
+        self.name = name
+        self._buffer = data
+        self.encoding = encoding or sniff_encoding(self.head()) or self.detect_encoding()
+
+    @property
+    def buffer(self):
+        return self._buffer
+
+    @property
+    def loaded(self):
+        """Whether the page bytes are at hand, so scanning them costs no extra read"""
+        return True
+
+    def head(self, size=4096):
+        return self.buffer[:size]
+
+    def iter_bytes(self, chunk_size=STREAM_CHUNK_SIZE):
+        for start in range(0, len(self.buffer), chunk_size):
+            yield self.buffer[start:start + chunk_size]
+
+    def detect_encoding(self):
+        """utf-8 if the whole page decodes as utf-8, else windows-1252"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            for chunk in self.iter_bytes():
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return 'windows-1252'
+        return 'utf-8'
+
+    def digest(self):
+        digest = hashlib.blake2b(digest_size=20)
+        for chunk in self.iter_bytes():
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    @property
+    def ascii_compatible(self):
+        """Whether ASCII text is encoded as itself (not so for UTF-16/32)"""
+        try:
+            return ASCII_PROBE.encode(self.encoding) == ASCII_PROBE.encode('ascii')
+        except (LookupError, UnicodeEncodeError):
+            return False
+
+    def text(self):
+        """The whole page decoded (straight from the buffer, without a bytes copy)"""
+        return str(self.buffer, self.encoding, 'replace')
+
+    def findall(self, pattern, flags=0):
+        """re.findall of a str pattern over the page, returning str matches.
+
+        ASCII-compatible pages are scanned as bytes; others are decoded first,
+        as an encoded pattern would not match them (UTF-16 adds a BOM).
+        """
+        encoding = self.encoding
+        if not self.ascii_compatible:
+            return re.findall(pattern, self.text(), flags)
+        try:
+            compiled = re.compile(pattern.encode(encoding), flags)
+        except UnicodeEncodeError:
+            return []  # The pattern cannot occur in this encoding
+        return [match.decode(encoding, 'replace') for match in compiled.findall(self.buffer)]
+
+    def iter_text(self, chunk_size=STREAM_CHUNK_SIZE):
+        """Decode the page incrementally, one chunk at a time"""
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        for chunk in self.iter_bytes(chunk_size):
+            yield decoder.decode(chunk)
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class MappedPageSource(PageSource):
+    """Plain page file, read through a read-only memory map"""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        buffer = b''
+        if os.fstat(self.file.fileno()).st_size:
+            buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        super().__init__(buffer, path)
+
+    def digest(self):
+        return hashlib.blake2b(self.buffer, digest_size=20).hexdigest()
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self.file.close()
+
+class CompressedPageSource(PageSource):
+    """gzip/bz2/zstd page file, decompressed into memory once, when first needed.
+
+    Parsing, hashing and scans read the one decompressed copy. Streaming
+    mode (iter_bytes before anything asked for the buffer) is handed the
+    decompressor's output chunk by chunk instead, so the page is never
+    held whole.
+    """
+
+    def __init__(self, path, opener):
+        self.name = path
+        self.opener = opener
+        self._buffer = None
+        self.file = opener(path, 'rb')
+        try:
+            self._head = self.file.read(4096)
+            self.encoding = sniff_encoding(self._head) or self.detect_encoding()
+        except BaseException:
+            self.file.close()
+            raise
+
+    @property
+    def loaded(self):
+        return self._buffer is not None
+
+    @property
+    def buffer(self):
+        if self._buffer is None:
+            if self.file.closed:
+                # Streamed already; only happens when a caller mixes both
+                self.file = self.opener(self.name, 'rb')
+                self._head = b''
+            self._buffer = self._head + self.file.read()
+            self.file.close()
+        return self._buffer
+
+    def head(self, size=4096):
+        return self.buffer[:size] if self.loaded else self._head[:size]
+
+    def iter_bytes(self, chunk_size=STREAM_CHUNK_SIZE):
+        if self.loaded:
+            yield from super().iter_bytes(chunk_size)
+            return
+        with self.file:
+            if self._head:
+                yield self._head
+            while True:
+                chunk = self.file.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def detect_encoding(self):
+        self.buffer  # the full check reads the page; decompress it only once
+        return super().detect_encoding()
+
+    def digest(self):
+        return hashlib.blake2b(self.buffer, digest_size=20).hexdigest()
+
+    def close(self):
+        self.file.close()
+
+def open_zstd(path, mode='rb'):
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Reading .zst pages needs the zstandard package (pip install zstandard)")
+    return zstandard.open(path, mode)
+
+COMPRESSION_OPENERS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.zst': open_zstd,
+}
+
+MHTML_SUFFIXES = ('.mhtml', '.mht')
+PAGE_SUFFIXES = ('.html', '.htm') + MHTML_SUFFIXES
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.zip')
+
+def mhtml_page_source(f, name):
+    """PageSource for the HTML document inside an MHTML ('Webpage, Complete') file"""
+    message = email.message_from_binary_file(f, policy=email.policy.default)
+    for part in message.walk():
+        if part.get_content_type() == 'text/html':
+            return PageSource(part.get_payload(decode=True), name, part.get_content_charset())
+    raise ValueError(f"No text/html part in MHTML file {name}")
+
+def open_page(path, content=None):
+    """Open a saved page: plain, gzip/bz2/zstd-compressed, MHTML, or in-memory bytes"""
+    base, suffix = os.path.splitext(path.lower())
+    opener = COMPRESSION_OPENERS.get(suffix)
+    inner_suffix = os.path.splitext(base)[1] if opener else suffix
+    
+    if content is not None:
+        if opener:
+            with opener(io.BytesIO(content), 'rb') as f:
+                content = f.read()
+        if inner_suffix in MHTML_SUFFIXES:
+            return mhtml_page_source(io.BytesIO(content), path)
+        return PageSource(content, path)
+    
+    if inner_suffix in MHTML_SUFFIXES:
+        with (opener or open)(path, 'rb') as f:
+            return mhtml_page_source(f, path)
+    if opener:
+        return CompressedPageSource(path, opener)
+    return MappedPageSource(path)
+
+def is_page_name(name):
+    name = name.lower()
+    base, suffix = os.path.splitext(name)
+    if suffix in COMPRESSION_OPENERS and not name.endswith(ARCHIVE_SUFFIXES):
+        name = base
+    return name.endswith(PAGE_SUFFIXES)
+
+# Bundle members are handed to workers as bytes, so each is held in memory
+MAX_BUNDLE_PAGE_BYTES = 256 * 1024 * 1024
+
+def bundle_page(label, size, read):
+    """(label, bytes) for a bundle member, or (label, error) when it is too large to hold"""
+    if size > MAX_BUNDLE_PAGE_BYTES:
+        return label, ValueError(f"page is {size / 1024 / 1024:.0f} MB, over the "
+                                 f"{MAX_BUNDLE_PAGE_BYTES // 1024 // 1024} MB limit for bundle members")
+    return label, read()
+
+def iter_archive_pages(path):
+    """Yield (label, bytes) for each page in a tar or zip bundle, without extracting to disk"""
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as bundle:
+            for info in bundle.infolist():
+                if not info.is_dir() and is_page_name(info.filename):
+                    yield bundle_page(f"{path}::{info.filename}", info.file_size,
+                                      lambda: bundle.read(info))
+        return
+    
+    # Stream mode reads members in order from a (possibly compressed) tar
+    with tarfile.open(path, mode='r|*') as bundle:
+        for member in bundle:
+            if member.isfile() and is_page_name(member.name):
+                yield bundle_page(f"{path}::{member.name}", member.size,
+                                  lambda: bundle.extractfile(member).read())
+
+LISTING_FIELDS = ['title', 'price', 'location', 'date', 'link', 'image_url', 'seller']
+# Extra columns filled in from each ad's detail page by DetailEnricher
+DETAIL_FIELDS = ['description', 'images', 'posted_at']
+
+def csv_row(listing):
+    """Listing with list values (detail page images) joined for a CSV cell"""
+    return {field: ' '.join(value) if isinstance(value, list) else value
+            for field, value in listing.items()}
+
+# Fields read from a card element, and those found by the SelectorPlan
+CARD_FIELDS = frozenset(LISTING_FIELDS)
+CARD_TEXT_FIELDS = ('title', 'price', 'location', 'date')
+
+def card_field(card, field, plan, metrics=DISABLED_METRICS):
+    """One listing field read from a card element, by extract_from_element's rules"""
+    if field == 'link':
+        link_elem = card.find('a', href=True)
+        if not link_elem:
+            return 'N/A'
+        href = link_elem.get('href')
+        return f"https://www.olx.in{href}" if href.startswith('/') else href
+    if field == 'image_url':
+        img_elem = card.find('img')
+        return img_elem.get('src', 'N/A') if img_elem else 'N/A'
+    if field not in CARD_TEXT_FIELDS:
+        return 'N/A'
+    text = plan.find_text(card, field, metrics)
+    if field == 'price' and text == 'N/A':
+        # Look for price patterns in text
+        price_match = PRICE_PATTERN.search(card.get_text())
+        text = price_match.group() if price_match else 'N/A'
+    return text
+
+class Listing(collections.abc.MutableMapping):
+    """One listing, with its fields in slots instead of a dict per listing.
+
+    It reads like the listing dicts it replaces (get, items, update;
+    serialize with json.dumps(..., default=dict)). A listing made from a
+    card element keeps the element and reads each field the first time it
+    is asked for, so cards dropped as duplicates or navigation never run
+    the selectors of fields nobody looked at. Given fields, only those are
+    read, at once, and the listing has no other keys.
+    """
+
+    FIELDS = tuple(LISTING_FIELDS + DETAIL_FIELDS)
+    __slots__ = FIELDS + ('_card', '_plan', '_metrics')
+
+    def __init__(self, data=(), card=None, plan=None, metrics=DISABLED_METRICS, fields=None):
+        self._card = card
+        self._plan = plan
+        self._metrics = metrics
+        for field, value in dict(data).items():
+            if fields is None or field in fields:
+                self[field] = value
+        if card is not None and fields is not None:
+            self.resolve(fields)
+
+    def __getattr__(self, field):
+        # Only reached for fields not read yet
+        if field in CARD_FIELDS and self._card is not None:
+            try:
+                value = card_field(self._card, field, self._plan, self._metrics)
+            except Exception:
+                value = 'N/A'
+            setattr(self, field, value)
+            return value
+        raise AttributeError(field)
+
+    def resolve(self, fields=None):
+        """Read the pending card fields (or only fields) and let go of the card element"""
+        if self._card is not None:
+            for field in LISTING_FIELDS if fields is None else fields:
+                if field in CARD_FIELDS:
+                    getattr(self, field)
+            self._card = self._plan = self._metrics = None
+        return self
+
+    def __contains__(self, field):
+        if field in CARD_FIELDS and self._card is not None:
+            return True
+        slot = LISTING_SLOTS.get(field)
+        if slot is None:
+            return False
+        try:
+            slot.__get__(self)
+        except AttributeError:
+            return False
+        return True
+
+    def __getitem__(self, field):
+        if field not in LISTING_SLOTS:
+            raise KeyError(field)
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def __setitem__(self, field, value):
+        if field not in LISTING_SLOTS:
+            raise KeyError(f"Listing has no field '{field}'")
+        setattr(self, field, value)
+
+    def __delitem__(self, field):
+        try:
+            delattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def __iter__(self):
+        return (field for field in self.FIELDS if field in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __reduce__(self):
+        return Listing, (dict(self),)
+
+    def __repr__(self):
+        return f"Listing({dict(self)!r})"
+
+LISTING_SLOTS = {field: Listing.__dict__[field] for field in Listing.FIELDS}
+
+def projected_fields(fields):
+    """Validated field projection; the title is always kept, as dedup needs it"""
+    if fields is None:
+        return None
+    unknown = [field for field in fields if field not in LISTING_SLOTS]
+    if unknown:
+        raise ValueError(f"Unknown listing fields: {', '.join(unknown)} "
+                         f"(expected some of: {', '.join(Listing.FIELDS)})")
+    return tuple(dict.fromkeys(['title', *fields]))
+
+def settle_listing(listing, fields=None):
+    """A listing as it leaves the parser: a Listing holding no card element, limited to fields"""
+    if isinstance(listing, Listing):
+        return listing.resolve(fields)
+    return Listing(listing, fields=fields)
+
+def listing_key(listing):
+    """Compact dedup key for a listing (8-byte digest of its lowercased title)"""
+    title = listing.get('title', '').lower()
+    if not title or title == 'n/a':
+        return None
+    return hashlib.blake2b(title.encode('utf-8'), digest_size=8).digest()
+
+def iter_unique(listings, seen_keys, metrics=DISABLED_METRICS):
+    """Yield listings whose key is not yet in seen_keys, recording new keys.
+
+    seen_keys is a set of listing_key digests (exact titles) or a
+    NearDuplicateIndex, which also drops reposts with small edits. The
+    time spent on the checks themselves goes to the 'dedup' stage of
+    metrics.
+    """
+    if isinstance(seen_keys, NearDuplicateIndex):
+        is_new = seen_keys.add
+    else:
+        def is_new(listing):
+            key = listing_key(listing)
+            if key is None or key in seen_keys:
+                return False
+            seen_keys.add(key)
+            return True
+    
+    if not metrics:
+        for listing in listings:
+            if is_new(listing):
+                yield listing
+        return
+    for listing in listings:
+        started = time.perf_counter()
+        new = is_new(listing)
+        metrics.add_time('dedup', time.perf_counter() - started)
+        if new:
+            yield listing
+
+def iter_collected(listings, collected):
+    """Pass listings through, appending each one to collected"""
+    for listing in listings:
+        collected.append(listing)
+        yield listing
+
+MASK64 = (1 << 64) - 1
+TITLE_WORD = re.compile(r'[^\W_]+')
+PLACEHOLDER_IMAGES = ('data:', 'N/A')
+
+class NearDuplicateIndex:
+    """MinHash/LSH index that recognises near-duplicate listings.
+
+    Titles are reduced to character shingles and a MinHash signature;
+    signatures are split into bands and only listings sharing a band
+    bucket or the same image URL are compared, so the cost stays roughly
+    linear in the number of listings. A candidate counts as a duplicate
+    when its estimated title similarity reaches threshold (image_threshold
+    when both listings show the same image) and its price (within
+    price_tolerance), canonical location and title numbers do not
+    contradict the match. A shared image alone never makes a duplicate.
+
+    Signatures are kept in one flat array of 32-bit values and the buckets
+    hold only band hashes and positions, so each listing costs a few
+    hundred bytes.
+
+    threshold trades recall for precision; num_perm trades speed for a
+    more accurate similarity estimate.
+    """
+
+    def __init__(self, threshold=0.7, num_perm=64, shingle_size=4, price_tolerance=0.1, seed=1,
+                 image_threshold=None):
+        self.threshold = threshold
+        self.image_threshold = threshold / 2 if image_threshold is None else image_threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.price_tolerance = price_tolerance
+        self.rows = self.band_rows(threshold, num_perm)
+        self.bands = num_perm // self.rows  # leftover permutations only feed the estimate
+        
+        coefficients = [
+            int.from_bytes(hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=8).digest(), 'little')
+            for i in range(2 * num_perm)
+        ]
+        # Multiply-shift hashing: (a * x + b) mod 2**64 with odd a, keeping the high 32 bits
+        self.a = [c | 1 for c in coefficients[:num_perm]]
+        self.b = coefficients[num_perm:]
+        if np is not None:
+            self.a_array = np.array(self.a, dtype=np.uint64)
+            self.b_array = np.array(self.b, dtype=np.uint64)
+        
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = array('I')  # num_perm values per recorded listing
+        self.entries = []  # (price, location, numbers) per recorded listing
+        self.images = {}
+    
+    @staticmethod
+    def band_rows(threshold, num_perm):
+        """Rows per band whose LSH threshold (1/bands)**(1/rows) sits just below threshold"""
+        target = threshold * 0.9  # favour recall; candidates are verified afterwards
+        return min(range(1, num_perm + 1),
+                   key=lambda rows: abs((1 / (num_perm // rows)) ** (1 / rows) - target))
+    
+    def shingles(self, title):
+        text = ' '.join(TITLE_WORD.findall(title.lower()))
+        size = self.shingle_size
+        if len(text) <= size:
+            return {text}
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+    
+    def signature(self, shingles):
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+        if np is not None:
+            values = np.array(hashes, dtype=np.uint64)[:, None]
+            return array('I', ((values * self.a_array + self.b_array) >> np.uint64(32)).min(axis=0).tolist())
+        return array('I', (
+            min(((a * value + b) & MASK64) >> 32 for value in hashes)
+            for a, b in zip(self.a, self.b)
+        ))
+    
+    def similarity(self, signature, position):
+        start = position * self.num_perm
+        other = self.signatures[start:start + self.num_perm]
+        return sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+    
+    def matches(self, signature, entry, position, same_image):
+        price, location, numbers = entry
+        other_price, other_location, other_numbers = self.entries[position]
+        if numbers != other_numbers:
+            return False
+        if location and other_location and location != other_location:
+            return False
+        if price and other_price and abs(price - other_price) > self.price_tolerance * max(price, other_price):
+            return False
+        needed = self.image_threshold if same_image else self.threshold
+        return self.similarity(signature, position) >= needed
+    
+    def add(self, listing):
+        """Record listing and return True, or return False if it duplicates a recorded one"""
+        title = listing.get('title', '')
+        if not isinstance(title, str) or not title or title.lower() == 'n/a':
+            return False
+        image = listing.get('image_url')
+        image_key = None
+        if isinstance(image, str) and image and not image.startswith(PLACEHOLDER_IMAGES):
+            image_key = hashlib.blake2b(image.encode('utf-8'), digest_size=8).digest()
+        
+        signature = self.signature(self.shingles(title))
+        entry = (
+            normalize_price(listing.get('price')),
+            normalize_location(listing.get('location')),
+            frozenset(word for word in TITLE_WORD.findall(title) if word.isdigit()),
+        )
+        band_keys = [
+            hash(signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)
+        ]
+        same_image = set(self.images.get(image_key, ())) if image_key else set()
+        for candidate in same_image:
+            if self.matches(signature, entry, candidate, True):
+                return False
+        checked = same_image
+        for bucket, band_key in zip(self.buckets, band_keys):
+            for candidate in bucket.get(band_key, ()):
+                if candidate not in checked:
+                    checked.add(candidate)
+                    if self.matches(signature, entry, candidate, False):
+                        return False
+        
+        position = len(self.entries)
+        self.entries.append(entry)
+        self.signatures.extend(signature)
+        for bucket, band_key in zip(self.buckets, band_keys):
+            bucket.setdefault(band_key, array('I')).append(position)
+        if image_key:
+            self.images.setdefault(image_key, array('I')).append(position)
+        return True
+    
+    def __len__(self):
+        return len(self.entries)
+
+# Assignments of page state objects in inline scripts. Only the prefix is
+# matched; the object itself is decoded by the JSON decoder in one pass.
+STATE_ASSIGNMENT = re.compile(
+    r'(?:window\.(?:__INITIAL_STATE__|__APOLLO_STATE__|initialState)|__NEXT_DATA__)\s*=\s*(?=\{)'
+)
+_json_decoder = json.JSONDecoder()
+
+def decode_embedded_states(script_text, script_id=None, metrics=DISABLED_METRICS):
+    """Yield the JSON state objects embedded in one script body.
+
+    Next.js pages keep their state in <script id="__NEXT_DATA__"> as plain
+    JSON; other pages assign it (window.__INITIAL_STATE__ = {...};), which
+    is decoded with raw_decode from the start of the object, so '};' inside
+    strings cannot truncate it.
+    """
+    if script_id == '__NEXT_DATA__':
+        try:
+            data = json.loads(script_text)
+        except ValueError:
+            metrics.count('json_blobs_failed')
+            return
+        metrics.count('json_blobs_decoded')
+        yield data
+        return
+    
+    pos = 0
+    while True:
+        match = STATE_ASSIGNMENT.search(script_text, pos)
+        if not match:
+            return
+        try:
+            data, pos = _json_decoder.raw_decode(script_text, match.end())
+        except ValueError:
+            metrics.count('json_blobs_failed')
+            pos = match.end()
+            continue
+        metrics.count('json_blobs_decoded')
+        yield data
+
+# Page classification: byte scans of the raw page, run before any parsing
+STATE_MARKER = r'window\.(?:__INITIAL_STATE__|__APOLLO_STATE__|initialState)|__NEXT_DATA__'
+ITEMBOX_MARKER = r'data-aut-id\s*=\s*["\']itemBox["\']'
+SCRIPT_START = re.compile(r'<script\b([^>]*)>', re.IGNORECASE)
+SCRIPT_END = re.compile(r'</script\s*>', re.IGNORECASE)
+SCRIPT_ID = re.compile(r'\bid\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+
+# Share of the page's itemBox cards the page state must cover before the
+# card extraction is skipped
+DEFAULT_COVERAGE_THRESHOLD = 1.0
+
+class PageProfile:
+    """What a cheap scan of the raw page bytes finds: page state and itemBox cards"""
+
+    def __init__(self, page):
+        self.has_state = bool(page.findall(STATE_MARKER))
+        self.cards = len(page.findall(ITEMBOX_MARKER))
+
+    @property
+    def page_type(self):
+        if self.has_state:
+            return 'state'
+        return 'itembox' if self.cards else 'generic'
+
+    def coverage(self, listings):
+        """Share of the itemBox cards accounted for by listings; None (unknown) without cards"""
+        if not self.cards:
+            return None
+        return listings / self.cards
+
+def iter_page_states(text, metrics=DISABLED_METRICS):
+    """Yield the state objects embedded in a page's inline scripts, without parsing the HTML.
+
+    Only <script> bodies are searched, so the markup and any text that
+    merely mentions a state assignment are skipped.
+    """
+    pos = 0
+    while True:
+        start = SCRIPT_START.search(text, pos)
+        if not start:
+            return
+        end = SCRIPT_END.search(text, start.end())
+        body_end = end.start() if end else len(text)
+        pos = end.end() if end else len(text)
+        if body_end - start.end() < 2:
+            continue  # external script
+        script_id = SCRIPT_ID.search(start.group(1))
+        yield from decode_embedded_states(text[start.end():body_end].strip(),
+                                          script_id.group(1) if script_id else None, metrics)
+
+def json_item_to_listing(data):
+    """Map a generic listing-like JSON object to a listing dict"""
+    return {
+        'title': data.get('title', data.get('name', 'N/A')),
+        'price': str(data.get('price', data.get('amount', 'N/A'))),
+        'location': data.get('location', data.get('city', 'N/A')),
+        'date': data.get('date', data.get('createdAt', 'N/A')),
+        'link': data.get('url', data.get('link', 'N/A')),
+        'image_url': data.get('image', data.get('thumbnail', 'N/A')),
+        'seller': 'N/A'
+    }
+
+def olx_state_item_to_listing(item):
+    """Map an ad from OLX's __INITIAL_STATE__ (states.items.elements) to a listing dict"""
+    price = item.get('price')
+    if isinstance(price, dict):
+        value = price.get('value') or {}
+        price = value.get('display') or value.get('raw')
+    
+    location = item.get('location', 'N/A')
+    resolved = item.get('locations_resolved')
+    if isinstance(resolved, dict):
+        parts = [resolved.get(key) for key in ('SUBLOCALITY_LEVEL_1_name', 'ADMIN_LEVEL_3_name')]
+        location = ', '.join(part for part in parts if part) or location
+    
+    images = item.get('images')
+    image_url = 'N/A'
+    if isinstance(images, list) and images and isinstance(images[0], dict):
+        image_url = images[0].get('url', 'N/A')
+    
+    # State ads carry no URL, only their ID, which is enough for the
+    # /item/<title slug>-iid-<id> detail page URL
+    link = item.get('url')
+    if not link and item.get('id') is not None:
+        slug = '-'.join(TITLE_WORD.findall(str(item.get('title', '')).lower()))
+        link = f"{OLX_BASE_URL}/item/{slug + '-' if slug else ''}iid-{item['id']}"
+    
+    return {
+        'title': item.get('title', 'N/A'),
+        'price': str(price) if price is not None else 'N/A',
+        'location': location,
+        'date': item.get('display_date', item.get('created_at', 'N/A')),
+        'link': link or 'N/A',
+        'image_url': image_url,
+        'seller': 'N/A'
+    }
+
+# Where known page-state shapes keep their listings, as dotted paths ('*'
+# matches any key or index), mapped to the function that converts one item.
+JSON_LISTING_PATHS = {
+    'states.items.elements': olx_state_item_to_listing,
+}
+
+# Blind-scan depth limit for state objects that match no registered path
+JSON_MAX_DEPTH = 3
+
+# Paginated search API responses (e.g. /api/relevance/v4/search) keep the
+# ads of one page under 'data' and the next page under metadata.next_page_url
+API_LISTING_PATHS = {
+    'data': olx_state_item_to_listing,
+}
+NEXT_PAGE_KEYS = ('next_page_url', 'nextPageUrl', 'next_page', 'nextPage', 'nextUrl')
+NEXT_PAGE_MAX_DEPTH = 6
+DEFAULT_MAX_API_PAGES = 20
+OLX_BASE_URL = 'https://www.olx.in'
+
+_END = object()
+
+def find_next_page_url(data, max_depth=NEXT_PAGE_MAX_DEPTH):
+    """First next-page URL (absolute or site-relative) named anywhere in a state or API object.
+
+    Nodes are visited breadth first in document order, so the shallowest,
+    earliest cursor wins.
+    """
+    pending = collections.deque([(data, 0)])
+    while pending:
+        node, depth = pending.popleft()
+        if isinstance(node, dict):
+            for key in NEXT_PAGE_KEYS:
+                value = node.get(key)
+                if isinstance(value, str) and value.startswith(('/', 'http://', 'https://')):
+                    return value
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            continue
+        if depth < max_depth:
+            pending.extend((child, depth + 1) for child in children if isinstance(child, (dict, list)))
+    return None
+
+def resolve_json_path(data, path):
+    """Yield every node of data found at a dotted path"""
+    nodes = [data]
+    for part in path.split('.'):
+        next_nodes = []
+        for node in nodes:
+            if isinstance(node, dict):
+                if part == '*':
+                    next_nodes.extend(node.values())
+                elif part in node:
+                    next_nodes.append(node[part])
+            elif isinstance(node, list):
+                if part == '*':
+                    next_nodes.extend(node)
+                elif part.isdigit() and int(part) < len(node):
+                    next_nodes.append(node[int(part)])
+        nodes = next_nodes
+    return iter(nodes)
+
+PRICE_PATTERN = re.compile(r'₹\s*[\d,]+|Rs\.?\s*[\d,]+')
+
+class SelectorPlan:
+    """Compiled per-field CSS selectors used by extract_from_element.
+
+    Selectors are compiled with soupsieve once and shared by every card of
+    a page and every page in a process; within a field they are tried in
+    order and the first non-empty text wins.
+    """
+
+    FIELD_SELECTORS = {
+        'title': [
+            '[data-aut-id="itemTitle"]',
+            'h1', 'h2', 'h3', 'h4',
+            '.title', '.name', '.heading',
+            'a[href*="item"]'
+        ],
+        'price': [
+            '[data-aut-id="itemPrice"]',
+            '.price', '.amount', '.cost',
+            '*[class*="price"]', '*[id*="price"]'
+        ],
+        'location': [
+            '[data-aut-id="item-location"]',
+            '.location', '.place', '.city',
+            '*[class*="location"]', '*[class*="place"]'
+        ],
+        'date': [
+            '[data-aut-id="item-date"]',
+            '.date', '.time', '.posted',
+            '*[class*="date"]', '*[class*="time"]'
+        ],
+    }
+
+    _shared = None
+    _shared_plans = {}
+
+    def __init__(self, field_selectors=None):
+        field_selectors = field_selectors or self.FIELD_SELECTORS
+        # Identifies the plan's selectors, e.g. in CardTemplate's cache
+        self.signature = self.selectors_signature(field_selectors)
+        self.fields = {}
+        for field, selectors in field_selectors.items():
+            compiled = []
+            for selector in selectors:
+                try:
+                    compiled.append(soupsieve.compile(selector))
+                except soupsieve.SelectorSyntaxError as e:
+                    print(f"Skipping invalid {field} selector {selector!r}: {e}")
+            self.fields[field] = compiled
+
+    @staticmethod
+    def selectors_signature(field_selectors):
+        """Digest of the selectors JSON"""
+        return hashlib.blake2b(
+            json.dumps(field_selectors, sort_keys=True).encode('utf-8'), digest_size=8
+        ).hexdigest()
+
+    @classmethod
+    def shared(cls):
+        """The default plan, compiled once per process"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @classmethod
+    def shared_for(cls, field_selectors):
+        """A plan for other selectors (e.g. detail pages), compiled once per process"""
+        key = cls.selectors_signature(field_selectors)
+        if key not in cls._shared_plans:
+            cls._shared_plans[key] = cls(field_selectors)
+        return cls._shared_plans[key]
+
+    def find_element(self, element, field, metrics=None):
+        """Return (element, text, selector) for the first selector with text"""
+        for tried, selector in enumerate(self.fields[field], 1):
+            found = selector.select_one(element)
+            if found:
+                text = found.get_text(strip=True)
+                if text:
+                    if metrics:
+                        metrics.count('selectors_tried', tried)
+                        metrics.count('selector_hits')
+                    return found, text, selector
+        if metrics:
+            metrics.count('selectors_tried', len(self.fields[field]))
+        return None, 'N/A', None
+
+    def find_text(self, element, field, metrics=None):
+        return self.find_element(element, field, metrics)[1]
+
+class ListingFilter:
+    """Rejects navigation and boilerplate elements picked up as listings.
+
+    The rejected phrases are compiled once into a single pattern that
+    matches titles made up of nothing but those phrases (and punctuation),
+    so "Help & Support" is rejected while "Selling car cover" or "Home
+    theatre 5.1 Sony", which merely contain a phrase, are kept. A rule
+    file has one phrase per line; blank lines and # comments are skipped
+    and a "min_length: N" line sets the shortest accepted title.
+    """
+
+    INVALID_PHRASES = [
+        'all categories', 'browse categories', 'home', 'login', 'register',
+        'post ad', 'sell', 'buy', 'help', 'about', 'about us', 'contact', 'contact us',
+        'privacy', 'terms', 'terms of use', 'conditions', 'policy', 'support',
+        'careers', 'blog', 'app download'
+    ]
+    MIN_TITLE_LENGTH = 5
+
+    _shared = {}
+
+    def __init__(self, phrases=None, min_length=MIN_TITLE_LENGTH):
+        self.phrases = list(self.INVALID_PHRASES if phrases is None else phrases)
+        self.min_length = min_length
+        alternatives = sorted({re.escape(phrase.strip()).replace(r'\ ', r'\s+')
+                               for phrase in self.phrases if phrase.strip()}, key=len, reverse=True)
+        phrase = r'(?:' + '|'.join(alternatives) + r')(?!\w)'
+        self.pattern = re.compile(
+            r'[\W_]*' + phrase + r'(?:[\W_]+' + phrase + r')*[\W_]*', re.IGNORECASE
+        ) if alternatives else None
+
+    @classmethod
+    def from_file(cls, path):
+        phrases = []
+        min_length = cls.MIN_TITLE_LENGTH
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                if line.lower().startswith('min_length:'):
+                    min_length = int(line.split(':', 1)[1])
+                else:
+                    phrases.append(line)
+        return cls(phrases, min_length)
+
+    @classmethod
+    def shared(cls, path=None):
+        """The filter for a rule file (or the defaults), compiled once per process"""
+        if path not in cls._shared:
+            cls._shared[path] = cls.from_file(path) if path else cls()
+        return cls._shared[path]
+
+    def accepts(self, listing):
+        title = listing.get('title', 'N/A')
+        if not isinstance(title, str):
+            return False
+        title = title.strip()
+        if not title or title == 'N/A' or len(title) < self.min_length:
+            return False
+        return not (self.pattern and self.pattern.fullmatch(title))
+
+# Cards needed before a template is learned; every sample must agree
+TEMPLATE_SAMPLE_SIZE = 5
+TEMPLATE_CACHE_SIZE = 512
+
+def card_fingerprint(card):
+    """Structural fingerprint of a card: its tag/class/data-aut-id skeleton"""
+    parts = [card.name]
+    for tag in card.find_all(True):
+        parts.append(f"{tag.name}.{'.'.join(tag.get('class') or [])}#{tag.get('data-aut-id', '')}")
+    return hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+# Attributes card_fingerprint records: selectors testing only these (and
+# tag names) match the same elements in every card with one fingerprint
+FINGERPRINT_ATTRIBUTES = {'class', 'data-aut-id'}
+SELECTOR_ATTRIBUTE = re.compile(r'\[\s*([\w-]+)')
+
+def selector_is_structural(selector):
+    pattern = selector.pattern
+    return ':' not in pattern and set(SELECTOR_ATTRIBUTE.findall(pattern)) <= FINGERPRINT_ATTRIBUTES
+
+def element_path(root, element):
+    """Path from root down to element as (tag child index, tag name) steps"""
+    path = []
+    while element is not root:
+        parent = element.parent
+        siblings = [child for child in parent.contents if isinstance(child, Tag)]
+        # By identity: Tag equality is structural and would match an identical earlier sibling
+        index = next(i for i, sibling in enumerate(siblings) if sibling is element)
+        path.append((index, element.name))
+        element = parent
+    return tuple(reversed(path))
+
+def follow_path(root, path):
+    """Walk a path from element_path, or return None if the card differs"""
+    node = root
+    for index, name in path:
+        children = [child for child in node.contents if isinstance(child, Tag)]
+        if index >= len(children) or children[index].name != name:
+            return None
+        node = children[index]
+    return node
+
+class CardTemplate:
+    """Where each field lives inside the cards of one page structure.
+
+    Learned from a few sample cards with the full SelectorPlan, then
+    applied to every other card with the same fingerprint as direct path
+    lookups. Templates are cached per process by selector plan and
+    fingerprint (least recently used first out), so later pages with the
+    same card structure skip learning too.
+    """
+
+    cache = collections.OrderedDict()
+
+    # Field specs: (path, selector, paths, selectors) for an element every
+    # sample had in the same place, paths and selectors checking per card
+    # that the plan's earlier selectors still find no text (structural ones
+    # by the paths of the empty elements they matched, others by selector);
+    # (EMPTY, paths, selectors), the same check for every selector, when no
+    # sample had the field; None when
+    # the samples disagree (resolved per card by the plan, as
+    # extract_from_element would). Link and image specs are MISSING when
+    # no sample had the element; the skeleton then has no such tag.
+    MISSING = 'missing'
+    EMPTY = 'empty'
+
+    def __init__(self, fields, link, image):
+        self.fields = fields
+        self.link = link
+        self.image = image
+
+    @classmethod
+    def for_cards(cls, cards, plan):
+        """Template for each card (None if unknown), learning missing ones"""
+        cache = cls.cache
+        keys = [(plan.signature, card_fingerprint(card)) for card in cards]
+        samples = {}
+        for key, card in zip(keys, cards):
+            if key in cache:
+                cache.move_to_end(key)
+            else:
+                samples.setdefault(key, []).append(card)
+        learned = {}
+        for key, group in samples.items():
+            if len(group) >= TEMPLATE_SAMPLE_SIZE:
+                learned[key] = cache[key] = cls.learn(group[:TEMPLATE_SAMPLE_SIZE], plan)
+                if len(cache) > TEMPLATE_CACHE_SIZE:
+                    cache.popitem(last=False)
+        return [learned.get(key) or cache.get(key) for key in keys]
+
+    @classmethod
+    def learn(cls, samples, plan):
+        """Learn a template from sample cards sharing one fingerprint"""
+        def agreed(specs):
+            return specs[0] if all(spec == specs[0] for spec in specs) else None
+
+        fields = {}
+        for field in plan.fields:
+            specs = []
+            for card in samples:
+                found, _, selector = plan.find_element(card, field)
+                specs.append((element_path(card, found), selector) if found is not None else None)
+            if all(spec is None for spec in specs):
+                fields[field] = cls.empty_spec(samples[0], plan, field)
+            else:
+                spec = agreed(specs)
+                if spec is not None:
+                    path, selector = spec
+                    _, paths, selectors = cls.empty_spec(samples[0], plan, field, selector)
+                    spec = (path, selector, paths, selectors)
+                fields[field] = spec
+
+        link = agreed([cls.locate(card, card.find('a', href=True)) for card in samples])
+        image = agreed([cls.locate(card, card.find('img')) for card in samples])
+        return cls(fields, link, image)
+
+    @classmethod
+    def empty_spec(cls, card, plan, field, until=None):
+        """EMPTY spec for the selectors of field that come before until (all without it)"""
+        paths = []
+        selectors = []
+        for selector in plan.fields[field]:
+            if selector is until:
+                break
+            if selector_is_structural(selector):
+                found = selector.select_one(card)
+                if found is not None:
+                    paths.append(element_path(card, found))
+            else:
+                selectors.append(selector)
+        return cls.EMPTY, tuple(paths), tuple(selectors)
+
+    def still_empty(self, card, paths, selectors):
+        """Whether a card has no text where the samples had none for a field"""
+        for path in paths:
+            found = follow_path(card, path)
+            if found is None or found.get_text(strip=True):
+                return False
+        for selector in selectors:
+            found = selector.select_one(card)
+            if found is not None and found.get_text(strip=True):
+                return False
+        return True
+
+    @classmethod
+    def locate(cls, card, element):
+        return element_path(card, element) if element is not None else cls.MISSING
+
+    def extract(self, card, plan, fields=None):
+        """Extract a card by direct lookups; None means it does not fit the template.
+
+        With fields given, the other fields are not looked up.
+        """
+        data = {}
+        for field, spec in self.fields.items():
+            if fields is not None and field not in fields:
+                continue
+            if spec is None:
+                data[field] = plan.find_text(card, field)
+            elif spec[0] == self.EMPTY:
+                _, paths, selectors = spec
+                data[field] = 'N/A' if self.still_empty(card, paths, selectors) else plan.find_text(card, field)
+            else:
+                path, selector, paths, selectors = spec
+                if not self.still_empty(card, paths, selectors):
+                    # An earlier selector has text on this card
+                    data[field] = plan.find_text(card, field)
+                    continue
+                found = follow_path(card, path)
+                if found is None or not selector.match(found):
+                    return None
+                data[field] = found.get_text(strip=True)
+                if not data[field]:
+                    return None
+
+        if data.get('price') == 'N/A':
+            # Mirror card_field's text fallback
+            price_match = PRICE_PATTERN.search(card.get_text())
+            data['price'] = price_match.group() if price_match else 'N/A'
+
+        data['link'] = 'N/A'
+        if self.link != self.MISSING and (fields is None or 'link' in fields):
+            link_elem = follow_path(card, self.link) if self.link else card.find('a', href=True)
+            if link_elem is None or link_elem.name != 'a' or link_elem.get('href') is None:
+                return None
+            href = link_elem.get('href')
+            data['link'] = f"https://www.olx.in{href}" if href.startswith('/') else href
+
+        data['image_url'] = 'N/A'
+        if self.image != self.MISSING and (fields is None or 'image_url' in fields):
+            img_elem = follow_path(card, self.image) if self.image else card.find('img')
+            if img_elem is None or img_elem.name != 'img':
+                return None
+            data['image_url'] = img_elem.get('src', 'N/A')
+
+        data['seller'] = 'N/A'
+        return data
+
+class CountingIterator:
+    """Iterator wrapper that counts the items passing through it"""
+
+    def __init__(self, iterable):
+        self.iterable = iter(iterable)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self.iterable)
+        self.count += 1
+        return item
+
+class ListingSink:
+    """Append listings to JSONL and/or CSV files as they arrive.
+
+    Nothing is buffered beyond the file objects themselves, so memory stays
+    flat however many listings pass through.
+    """
+
+    def __init__(self, jsonl_path=None, csv_path=None, flush_every=100, fieldnames=LISTING_FIELDS):
+        self.flush_every = flush_every
+        self.written = 0
+        self.jsonl_file = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+        self.csv_file = None
+        self.csv_writer = None
+        if csv_path:
+            new_file = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+            self.csv_file = open(csv_path, 'a', newline='', encoding='utf-8')
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=fieldnames,
+                                             extrasaction='ignore')
+            if new_file:
+                self.csv_writer.writeheader()
+
+    def write(self, listing):
+        if self.jsonl_file:
+            self.jsonl_file.write(json.dumps(listing, ensure_ascii=False, default=dict) + '\n')
+        if self.csv_writer:
+            self.csv_writer.writerow(csv_row(listing))
+        self.written += 1
+        if self.written % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        for f in (self.jsonl_file, self.csv_file):
+            if f:
+                f.flush()
+
+    def close(self):
+        for f in (self.jsonl_file, self.csv_file):
+            if f:
+                f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+PRICE_NUMBER = re.compile(r'(\d[\d,]*(?:\.\d+)?)(?:\s*(lakhs?|lacs?|l|crores?|cr)\b)?', re.IGNORECASE)
+# Indian number words OLX abbreviates large prices with ('₹ 5.5 Lakh')
+PRICE_UNITS = {'lakh': 10**5, 'lac': 10**5, 'l': 10**5, 'crore': 10**7, 'cr': 10**7}
+RELATIVE_DATE = re.compile(r'(\d+)\s*(minute|min|hour|hr|day|week|month|year|yr)s?\s+ago', re.IGNORECASE)
+RELATIVE_UNITS = {
+    'minute': timedelta(minutes=1), 'min': timedelta(minutes=1),
+    'hour': timedelta(hours=1), 'hr': timedelta(hours=1),
+    'day': timedelta(days=1), 'week': timedelta(weeks=1), 'month': timedelta(days=30),
+    'year': timedelta(days=365), 'yr': timedelta(days=365),
+}
+DATE_FORMATS = ['%b %d, %Y', '%d %b %Y', '%B %d, %Y', '%d %B %Y', '%d/%m/%Y']
+YEARLESS_DATE_FORMATS = ['%b %d', '%d %b', '%B %d', '%d %B']
+
+def normalize_price(text):
+    """Price text such as '₹ 1,299' or '₹ 5.5 Lakh' as integer paise, or None"""
+    if text is None or text == 'N/A':
+        return None
+    match = PRICE_NUMBER.search(str(text))
+    if not match:
+        return None
+    number, unit = match.groups()
+    multiplier = PRICE_UNITS[unit.lower().rstrip('s')] if unit else 1
+    return round(float(number.replace(',', '')) * multiplier * 100)
+
+def normalize_date(text, scraped_at):
+    """Posted-date text ('Today', '3 days ago', 'Oct 12', ISO) as a date, or None"""
+    if not text or text == 'N/A':
+        return None
+    text = str(text).strip()
+    lowered = text.lower()
+    if lowered in ('today', 'just now'):
+        return scraped_at.date()
+    if lowered == 'yesterday':
+        return scraped_at.date() - timedelta(days=1)
+    
+    relative = RELATIVE_DATE.search(lowered)
+    if relative:
+        return (scraped_at - int(relative.group(1)) * RELATIVE_UNITS[relative.group(2)]).date()
+    
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).date()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    for fmt in YEARLESS_DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(f"{text} {scraped_at.year}", f"{fmt} %Y").date()
+        except ValueError:
+            continue
+        # A yearless date after the scrape must be from the previous year
+        return parsed.replace(year=parsed.year - 1) if parsed > scraped_at.date() else parsed
+    return None
+
+def normalize_location(text):
+    """Canonical location: trimmed, single-spaced, title-cased comma parts, or None"""
+    if not text or text == 'N/A' or not isinstance(text, str):
+        return None
+    parts = [' '.join(part.split()).title() for part in text.split(',')]
+    return ', '.join(part for part in parts if part) or None
+
+class ListingColumns:
+    """Typed, column-wise store of normalised listing fields.
+
+    Prices (paise), posted dates (days since epoch) and location codes are
+    appended to compact arrays as listings pass through and exposed as
+    NumPy arrays, so summaries over millions of listings are vectorised.
+    Missing values are stored as -1 (price, location) or MISSING_DAY.
+    """
+
+    MISSING_DAY = -2**31
+    EPOCH = date(1970, 1, 1)
+
+    def __init__(self):
+        self.price_paise = array('q')
+        self.posted_day = array('i')
+        self.location_code = array('i')
+        self.locations = []
+        self.location_index = {}
+
+    def __len__(self):
+        return len(self.price_paise)
+
+    def append(self, listing, scraped_at):
+        price = normalize_price(listing.get('price'))
+        self.price_paise.append(-1 if price is None else price)
+        
+        posted = normalize_date(listing.get('date'), scraped_at)
+        self.posted_day.append(self.MISSING_DAY if posted is None else (posted - self.EPOCH).days)
+        
+        location = normalize_location(listing.get('location'))
+        if location is None:
+            self.location_code.append(-1)
+        else:
+            code = self.location_index.get(location)
+            if code is None:
+                code = self.location_index[location] = len(self.locations)
+                self.locations.append(location)
+            self.location_code.append(code)
+
+    def extend(self, listings, scraped_at):
+        for listing in listings:
+            self.append(listing, scraped_at)
+
+    def arrays(self):
+        """(prices, posted dates, location codes) as NumPy arrays, sharing memory with the columns"""
+        if np is None:
+            raise RuntimeError("Listing statistics need numpy (pip install numpy)")
+        prices = np.frombuffer(self.price_paise, dtype=np.int64) if self.price_paise else np.zeros(0, np.int64)
+        days = np.frombuffer(self.posted_day, dtype=np.int32) if self.posted_day else np.zeros(0, np.int32)
+        codes = np.frombuffer(self.location_code, dtype=np.int32) if self.location_code else np.zeros(0, np.int32)
+        posted = np.where(days == self.MISSING_DAY, np.datetime64('NaT'),
+                          days.astype('datetime64[D]'))
+        return prices, posted, codes
+
+    def price_stats(self, percentiles=(10, 25, 50, 75, 90)):
+        """Count, min, max, mean and percentiles of known prices, in paise"""
+        prices = self.arrays()[0]
+        known = prices[prices >= 0]
+        if not known.size:
+            return None
+        return {
+            'count': int(known.size),
+            'min': int(known.min()),
+            'max': int(known.max()),
+            'mean': float(known.mean()),
+            'percentiles': dict(zip(percentiles, np.percentile(known, percentiles).tolist())),
+        }
+
+    def location_stats(self):
+        """Listing count, priced count and mean price (paise) per location code"""
+        prices, _, codes = self.arrays()
+        located = codes >= 0
+        counts = np.bincount(codes[located], minlength=len(self.locations))
+        priced = located & (prices >= 0)
+        priced_counts = np.bincount(codes[priced], minlength=len(self.locations))
+        totals = np.bincount(codes[priced], weights=prices[priced], minlength=len(self.locations))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = totals / priced_counts
+        return counts, priced_counts, means
+
+    def date_range(self):
+        posted = self.arrays()[1]
+        known = posted[~np.isnat(posted)]
+        if not known.size:
+            return None
+        return str(known.min()), str(known.max())
+
+def text_value(value):
+    """Listing field as a string column value (None for missing)"""
+    if value is None or value == 'N/A':
+        return None
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+class ColumnarListingSink:
+    """Write listings as typed Arrow record batches to Parquet or Arrow IPC.
+
+    Every run writes a new part file into directory, so repeated batch runs
+    append to one dataset (pyarrow.dataset.dataset(directory) loads them
+    all). Rows are buffered up to batch_size and written as one row group
+    (Parquet) or record batch (Arrow IPC). Needs pyarrow.
+    """
+
+    FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+    def __init__(self, directory, fmt='parquet', batch_size=50000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Columnar output needs pyarrow (pip install pyarrow)")
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unknown columnar format '{fmt}', expected one of: {', '.join(self.FORMATS)}")
+        
+        self.pa = pa
+        self.pq = pq
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.schema = pa.schema(
+            [(field, pa.string()) for field in LISTING_FIELDS] + [
+                ('price_paise', pa.int64()),
+                ('posted_date', pa.date32()),
+                ('location_canonical', pa.string()),
+                ('scraped_at', pa.timestamp('s')),
+            ]
+        )
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(
+            directory, f"part-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{os.getpid()}{self.FORMATS[fmt]}"
+        )
+        self.writer = None
+        self.written = 0
+        self.rows = {name: [] for name in self.schema.names}
+
+    def write(self, listing, scraped_at):
+        rows = self.rows
+        for field in LISTING_FIELDS:
+            rows[field].append(text_value(listing.get(field)))
+        rows['price_paise'].append(normalize_price(listing.get('price')))
+        rows['posted_date'].append(normalize_date(listing.get('date'), scraped_at))
+        rows['location_canonical'].append(normalize_location(listing.get('location')))
+        rows['scraped_at'].append(scraped_at.replace(microsecond=0))
+        if len(rows['title']) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows['title']:
+            return
+        batch = self.pa.RecordBatch.from_pydict(self.rows, schema=self.schema)
+        if self.writer is None:
+            if self.fmt == 'parquet':
+                self.writer = self.pq.ParquetWriter(self.path, self.schema)
+            else:
+                self.writer = self.pa.ipc.new_file(self.path, self.schema)
+        if self.fmt == 'parquet':
+            self.writer.write_table(self.pa.Table.from_batches([batch]), row_group_size=self.batch_size)
+        else:
+            self.writer.write_batch(batch)
+        self.written += batch.num_rows
+        self.rows = {name: [] for name in self.schema.names}
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def print_listing_statistics(columns, top=5):
+    """Print price, date and location statistics from ListingColumns"""
+    if np is None:
+        print("\n(Install numpy for price and location statistics)")
+        return
+    
+    stats = columns.price_stats()
+    if stats:
+        print(f"\nPrice analysis:")
+        print(f"   Range: ₹{stats['min'] / 100:,.0f} - ₹{stats['max'] / 100:,.0f}")
+        print(f"   Average: ₹{stats['mean'] / 100:,.0f}")
+        print("   Percentiles: " + ', '.join(f"p{p}: ₹{value / 100:,.0f}"
+                                            for p, value in stats['percentiles'].items()))
+        print(f"   Listings with prices: {stats['count']}")
+    
+    dates = columns.date_range()
+    if dates:
+        print(f"\nPosted between {dates[0]} and {dates[1]}")
+    
+    if columns.locations:
+        counts, priced_counts, means = columns.location_stats()
+        print(f"\nTop locations:")
+        for code in np.argsort(counts)[::-1][:top]:
+            average = f", avg ₹{means[code] / 100:,.0f}" if priced_counts[code] else ''
+            print(f"   {columns.locations[code]}: {counts[code]} listings{average}")
+
+# Bump when a change alters the listings extracted from a page, so cached
+# results from older versions are not reused.
+PARSER_VERSION = '10'
+
+DEFAULT_CACHE_PATH = 'olx_parse_cache.sqlite'
+DEFAULT_CACHE_MAX_MB = 512
+
+class ParseCache:
+    """On-disk cache of the listings extracted from each page.
+
+    Entries are keyed by a hash of the page content plus PARSER_VERSION and
+    a hash of the parser options that change what a page yields, and are
+    stored zlib-compressed in SQLite. When the total stored size exceeds
+    max_bytes the least recently used pages are evicted.
+    """
+
+    _shared = {}
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'key TEXT PRIMARY KEY, listings BLOB NOT NULL, '
+            'size INTEGER NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used)')
+        self.conn.commit()
+
+    @classmethod
+    def shared(cls, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        """One open cache per path in this process"""
+        if path not in cls._shared:
+            cls._shared[path] = cls(path, max_bytes)
+        return cls._shared[path]
+
+    @staticmethod
+    def key_for(page, options=''):
+        """Cache key for an open PageSource parsed with options (see EnhancedOLXParser.options_key)"""
+        return f"{PARSER_VERSION}:{options}:{page.digest()}"
+
+    def get(self, key):
+        row = self.conn.execute('SELECT listings FROM pages WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute('UPDATE pages SET last_used = ? WHERE key = ?', (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, listings):
+        blob = zlib.compress(json.dumps(listings, ensure_ascii=False, default=dict).encode('utf-8'))
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)',
+                              (key, blob, len(blob), time.time()))
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used pages until the cache fits in max_bytes"""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with self.conn:
+            rows = self.conn.execute('SELECT key, size FROM pages ORDER BY last_used')
+            stale = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            self.conn.executemany('DELETE FROM pages WHERE key = ?', stale)
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute('DELETE FROM pages')
+        self.conn.execute('VACUUM')
+
+DEFAULT_SNAPSHOT_PATH = 'olx_snapshots.sqlite'
+DEFAULT_STORE_PATH = 'olx_listings.sqlite'
+
+AD_ID_PATTERN = re.compile(r'iid-(\d+)')
+
+def card_key(card):
+    """Identify a listing card by its OLX ad ID, or its link if it has none"""
+    link = card.find('a', href=True)
+    if link is None:
+        return None
+    href = link.get('href')
+    ad_id = AD_ID_PATTERN.search(href)
+    return ad_id.group(1) if ad_id else href
+
+def search_fingerprint(index):
+    """Identify the search a saved page belongs to by its canonical URL or title"""
+    for link in index.tag('link'):
+        if 'canonical' in (link.get('rel') or []) and link.get('href'):
+            return link.get('href').strip().lower()
+    for meta in index.tag('meta'):
+        if meta.get('property') == 'og:url' and meta.get('content'):
+            return meta.get('content').strip().lower()
+    title = index.find('title')
+    return title.get_text(strip=True).lower() if title else None
+
+# Cards parsed into small trees before they are extracted as one run
+STREAM_CARD_BATCH = 20
+
+class StreamingPageReader(HTMLParser):
+    """Incremental tokenizer that cuts itemBox cards and state scripts out of a page.
+
+    Pages are fed in chunks; each complete <div data-aut-id="itemBox"> is
+    re-serialised and queued as a ('card', html) event and each inline
+    script as a ('script', (text, id)) event. Nothing outside the current
+    card or script is kept, so memory does not grow with the page.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+        self.card_parts = None
+        self.card_div_depth = 0
+        self.script_parts = None
+        self.script_id = None
+        self.title_parts = None
+        self.title = None
+        self.canonical = None
+        self.og_url = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.card_parts is not None:
+            self.card_parts.append(self.get_starttag_text())
+            if tag == 'div':
+                self.card_div_depth += 1
+            return
+        
+        attrs = dict(attrs)
+        if tag == 'div' and attrs.get('data-aut-id') == 'itemBox':
+            self.card_parts = [self.get_starttag_text()]
+            self.card_div_depth = 1
+        elif tag == 'script':
+            self.script_parts = []
+            self.script_id = attrs.get('id')
+        elif tag == 'title' and self.title is None:
+            self.title_parts = []
+        elif tag == 'link' and 'canonical' in (attrs.get('rel') or '').split() and attrs.get('href'):
+            self.canonical = self.canonical or attrs['href']
+        elif tag == 'meta' and attrs.get('property') == 'og:url' and attrs.get('content'):
+            self.og_url = self.og_url or attrs['content']
+
+    def handle_startendtag(self, tag, attrs):
+        if self.card_parts is not None:
+            self.card_parts.append(self.get_starttag_text())
+        else:
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if self.card_parts is not None:
+            self.card_parts.append(f'</{tag}>')
+            if tag == 'div':
+                self.card_div_depth -= 1
+                if self.card_div_depth == 0:
+                    self.events.append(('card', ''.join(self.card_parts)))
+                    self.card_parts = None
+        elif tag == 'script' and self.script_parts is not None:
+            self.events.append(('script', (''.join(self.script_parts), self.script_id)))
+            self.script_parts = None
+        elif tag == 'title' and self.title_parts is not None:
+            self.title = ''.join(self.title_parts).strip()
+            self.title_parts = None
+
+    def handle_data(self, data):
+        if self.card_parts is not None:
+            self.card_parts.append(data if self.cdata_elem else escape(data, quote=False))
+        elif self.script_parts is not None:
+            self.script_parts.append(data)
+        elif self.title_parts is not None:
+            self.title_parts.append(data)
+
+    def pop_events(self):
+        events, self.events = self.events, []
+        return events
+
+    def search_fingerprint(self):
+        """Same precedence as search_fingerprint(): canonical URL, og:url, title"""
+        for value in (self.canonical, self.og_url, self.title):
+            if value:
+                return value.strip().lower()
+        return None
+
+class Snapshot:
+    """Cards already extracted from earlier saves of one search"""
+
+    def __init__(self, search, cards):
+        self.search = search
+        self.cards = cards
+        self.new = {}
+
+    def add(self, key, listing):
+        self.cards[key] = listing
+        self.new[key] = listing
+
+class SnapshotStore:
+    """SQLite store of extracted cards per search, for incremental re-parsing.
+
+    Each re-save of a scrolled results page is a superset of the previous
+    one, so cards whose ad ID was already extracted for the same search are
+    reused instead of being extracted again.
+    """
+
+    _shared = {}
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS cards ('
+            'search TEXT NOT NULL, card TEXT NOT NULL, listing TEXT NOT NULL, '
+            'PRIMARY KEY (search, card))'
+        )
+        self.conn.commit()
+
+    @classmethod
+    def shared(cls, path=DEFAULT_SNAPSHOT_PATH):
+        """One open store per path in this process"""
+        if path not in cls._shared:
+            cls._shared[path] = cls(path)
+        return cls._shared[path]
+
+    def load(self, search):
+        rows = self.conn.execute('SELECT card, listing FROM cards WHERE search = ?', (search,))
+        return Snapshot(search, {card: json.loads(listing) for card, listing in rows})
+
+    def save(self, snapshot):
+        if not snapshot.new:
+            return
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO cards VALUES (?, ?, ?)',
+                [(snapshot.search, card, json.dumps(listing, ensure_ascii=False, default=dict))
+                 for card, listing in snapshot.new.items()]
+            )
+        snapshot.new = {}
+
+def listing_store_key(listing):
+    """Persistent key for a listing: its OLX ad ID, else its link, else its title digest"""
+    link = text_value(listing.get('link'))
+    if link:
+        ad_id = AD_ID_PATTERN.search(link)
+        return ad_id.group(1) if ad_id else link
+    key = listing_key(listing)
+    return f"title:{key.hex()}" if key else None
+
+class ListingStore:
+    """SQLite store of every listing seen across runs, keyed by OLX ad ID.
+
+    upsert() writes a page of listings in one transaction, one indexed
+    write per listing; first_seen/last_seen track when an ad appeared and
+    was last scraped, and a trigger appends to price_history whenever the
+    normalised price of an ad changes. Pages may arrive out of order (old
+    archives processed late): a scrape older than last_seen only widens
+    first_seen and counts the sighting, without overwriting newer fields.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS listings ('
+        'key TEXT PRIMARY KEY, title TEXT, price TEXT, price_paise INTEGER, '
+        'location TEXT, location_canonical TEXT, date TEXT, posted_date TEXT, '
+        'link TEXT, image_url TEXT, seller TEXT, '
+        'first_seen TEXT NOT NULL, last_seen TEXT NOT NULL, times_seen INTEGER NOT NULL DEFAULT 1)',
+        'CREATE TABLE IF NOT EXISTS price_history ('
+        'key TEXT NOT NULL, seen_at TEXT NOT NULL, price TEXT, price_paise INTEGER)',
+        'CREATE INDEX IF NOT EXISTS listings_price ON listings (price_paise)',
+        'CREATE INDEX IF NOT EXISTS listings_location ON listings (location_canonical)',
+        'CREATE INDEX IF NOT EXISTS listings_first_seen ON listings (first_seen)',
+        'CREATE INDEX IF NOT EXISTS listings_last_seen ON listings (last_seen)',
+        'CREATE INDEX IF NOT EXISTS price_history_key ON price_history (key, seen_at)',
+        'CREATE TRIGGER IF NOT EXISTS listings_price_added AFTER INSERT ON listings '
+        'BEGIN INSERT INTO price_history VALUES (new.key, new.last_seen, new.price, new.price_paise); END',
+        'CREATE TRIGGER IF NOT EXISTS listings_price_changed AFTER UPDATE OF price_paise ON listings '
+        'WHEN new.price_paise IS NOT old.price_paise '
+        'BEGIN INSERT INTO price_history VALUES (new.key, new.last_seen, new.price, new.price_paise); END',
+    )
+
+    FIELD_COLUMNS = ('title', 'price', 'price_paise', 'location', 'location_canonical', 'date',
+                     'posted_date', 'link', 'image_url', 'seller')
+
+    # Field columns only take the incoming values when the scrape is not
+    # older than the stored one, so the price trigger (which records
+    # new.last_seen) always dates a change by the scrape that made it
+    UPSERT = (
+        f"INSERT INTO listings (key, {', '.join(FIELD_COLUMNS)}, first_seen, last_seen) "
+        f"VALUES ({', '.join('?' * (len(FIELD_COLUMNS) + 3))}) "
+        'ON CONFLICT (key) DO UPDATE SET '
+        + ''.join(f'{column} = CASE WHEN excluded.last_seen >= listings.last_seen '
+                  f'THEN excluded.{column} ELSE listings.{column} END, '
+                  for column in FIELD_COLUMNS)
+        + 'first_seen = min(listings.first_seen, excluded.first_seen), '
+        'last_seen = max(listings.last_seen, excluded.last_seen), '
+        'times_seen = listings.times_seen + 1'
+    )
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            for statement in self.SCHEMA:
+                self.conn.execute(statement)
+
+    def upsert(self, listings, scraped_at):
+        """Insert or refresh listings seen at scraped_at; returns how many were written.
+
+        An ad listed more than once on the page is one sighting (the first listing counts).
+        """
+        seen_at = scraped_at.isoformat(timespec='seconds')
+        rows = {}
+        for listing in listings:
+            key = listing_store_key(listing)
+            if key is None or key in rows:
+                continue
+            posted = normalize_date(listing.get('date'), scraped_at)
+            rows[key] = (
+                key, text_value(listing.get('title')), text_value(listing.get('price')),
+                normalize_price(listing.get('price')), text_value(listing.get('location')),
+                normalize_location(listing.get('location')), text_value(listing.get('date')),
+                posted.isoformat() if posted else None, text_value(listing.get('link')),
+                text_value(listing.get('image_url')), text_value(listing.get('seller')),
+                seen_at, seen_at,
+            )
+        with self.conn:
+            self.conn.executemany(self.UPSERT, rows.values())
+        return len(rows)
+
+    def count(self):
+        return self.conn.execute('SELECT count(*) FROM listings').fetchone()[0]
+
+    def price_history(self, key):
+        """[(seen_at, price, price_paise)] for one listing, oldest first"""
+        return self.conn.execute(
+            'SELECT seen_at, price, price_paise FROM price_history WHERE key = ? ORDER BY seen_at',
+            (key,)
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ElementIndex:
+    """Index of a parsed page built in a single walk over the tree.
+
+    Lookups by tag, class token, data-aut-id and href keyword are answered
+    from this index instead of sweeping the whole tree with find_all.
+    """
+
+    HREF_KEYWORDS = ['item', 'ad', 'product', 'listing']
+
+    def __init__(self, soup):
+        self.soup = soup
+        self.position = {}
+        self.by_tag = {}
+        self.by_class = {}
+        self.by_data_aut_id = {}
+        self.by_href_keyword = {}
+        self.data_elements = []
+        self.links = []
+
+        for elem in soup.find_all(True):
+            self.position[id(elem)] = len(self.position)
+            self.by_tag.setdefault(elem.name, []).append(elem)
+
+            for cls in dict.fromkeys(elem.get('class') or []):
+                self.by_class.setdefault(cls, []).append(elem)
+
+            data_id = elem.get('data-aut-id')
+            if data_id is not None:
+                self.data_elements.append(elem)
+                self.by_data_aut_id.setdefault(data_id, []).append(elem)
+
+            if elem.name == 'a':
+                href = elem.get('href')
+                if href is not None:
+                    self.links.append(elem)
+                    href = href.lower()
+                    for keyword in self.HREF_KEYWORDS:
+                        if keyword in href:
+                            self.by_href_keyword.setdefault(keyword, []).append(elem)
+
+    def _merge(self, groups, tag=None):
+        """Union several element lists, keeping document order"""
+        seen = {}
+        for group in groups:
+            for elem in group:
+                if tag is None or elem.name == tag:
+                    seen[id(elem)] = elem
+        return sorted(seen.values(), key=lambda elem: self.position[id(elem)])
+
+    def find(self, tag):
+        elements = self.by_tag.get(tag)
+        return elements[0] if elements else None
+
+    def tag(self, tag):
+        return self.by_tag.get(tag, [])
+
+    def with_class(self, cls, tag=None):
+        elements = self.by_class.get(cls, [])
+        if tag is None:
+            return elements
+        return [elem for elem in elements if elem.name == tag]
+
+    def class_containing(self, fragment, tag=None):
+        """Elements with any class token containing fragment (case-insensitive)"""
+        fragment = fragment.lower()
+        groups = [elements for cls, elements in self.by_class.items() if fragment in cls.lower()]
+        return self._merge(groups, tag)
+
+    def with_data_aut_id(self, value, tag=None):
+        elements = self.by_data_aut_id.get(value, [])
+        if tag is None:
+            return elements
+        return [elem for elem in elements if elem.name == tag]
+
+    def links_with_keywords(self, keywords):
+        return self._merge([self.by_href_keyword.get(keyword, []) for keyword in keywords])
+
 class EnhancedOLXParser:
-    def __init__(self, html_file_path):
+    def __init__(self, html_file_path, diagnostics=True, parser_backend='html.parser',
+                 json_max_depth=JSON_MAX_DEPTH, json_listing_paths=None, selector_plan=None,
+                 learn_templates=True, cache=None, snapshots=None, streaming=False, content=None,
+                 near_duplicates=None, filter_rules=None, metrics=False,
+                 coverage_threshold=DEFAULT_COVERAGE_THRESHOLD, follow_pages=0, fetch_options=None,
+                 fields=None):
         self.html_file_path = html_file_path
+        self.content = content  # page bytes, when the page does not come from html_file_path
+        self.diagnostics = diagnostics
+        self.parser_backend = resolve_parser_backend(parser_backend)
+        self.json_max_depth = json_max_depth
+        self.json_listing_paths = JSON_LISTING_PATHS if json_listing_paths is None else json_listing_paths
+        self.selector_plan = selector_plan or SelectorPlan.shared()
+        self.learn_templates = learn_templates
+        self.cache = cache
+        self.snapshots = snapshots
+        self.snapshot = None
+        self.reused_cards = 0
+        self.streaming = streaming
+        self.near_duplicates = near_duplicates  # NearDuplicateIndex threshold, or None for exact titles
+        self.listing_filter = ListingFilter.shared(filter_rules)
+        self.metrics = PageMetrics(html_file_path) if metrics else DISABLED_METRICS
+        self.coverage_threshold = coverage_threshold  # None runs every strategy
+        self.page_type = None
+        self.strategy_path = None
+        self.follow_pages = follow_pages  # search API pages to walk after this page
+        self.fetch_options = fetch_options
+        self.next_page_url = None
+        self.fields = projected_fields(fields)  # None reads every field, lazily
+        self.index = None
+        self.error = None
+    
+    def options_key(self):
+        """Digest of the options that change which listings a page yields"""
+        options = {
+            'backend': self.parser_backend,
+            'streaming': self.streaming,
+            'json_max_depth': self.json_max_depth,
+            'json_listing_paths': [(path, f"{to_listing.__module__}.{to_listing.__qualname__}")
+                                   for path, to_listing in self.json_listing_paths.items()],
+            'selectors': self.selector_plan.signature,
+            'filter': [self.listing_filter.phrases, self.listing_filter.min_length],
+            'coverage_threshold': self.coverage_threshold,
+        }
+        return hashlib.blake2b(json.dumps(options, sort_keys=True).encode('utf-8'),
+                               digest_size=8).hexdigest()
+    
+    def log(self, message):
+        """Print progress messages unless diagnostics are switched off"""
+        if self.diagnostics:
+            print(message)
         
-    def analyze_html_structure(self):
-        """Analyze the HTML structure to understand the page layout"""
+    def analyze_html_structure(self, page=None):
+        """Parse and index the page, optionally reporting its layout"""
+        metrics = self.metrics
         try:
-            with open(self.html_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            print("="*60)
-            print("HTML STRUCTURE ANALYSIS")
-            print("="*60)
-            
-            # Basic page info
-            title = soup.find('title')
-            print(f"Page Title: {title.text if title else 'Not found'}")
-            
-            # Check for common OLX indicators
-            olx_indicators = [
-                'olx', 'item', 'listing', 'product', 'ad', 'classified'
-            ]
-            
-            found_indicators = []
-            for indicator in olx_indicators:
-                elements = soup.find_all(class_=lambda x: x and indicator in x.lower())
-                if elements:
-                    found_indicators.append(f"{indicator}: {len(elements)} elements")
-            
-            print(f"OLX-related elements found: {', '.join(found_indicators) if found_indicators else 'None'}")
-            
-            data_elements = soup.find_all(attrs={'data-aut-id': True})
-            print(f"Elements with data-aut-id: {len(data_elements)}")
-            
-            if data_elements:
-                unique_data_ids = set([elem.get('data-aut-id') for elem in data_elements])
-                print("Common data-aut-id values:")
-                for data_id in sorted(unique_data_ids)[:10]:  # Show first 10
-                    print(f"  - {data_id}")
-            
-            # Look for price patterns
-            price_patterns = [r'₹\s*[\d,]+', r'Rs\.?\s*[\d,]+', r'\d+\s*rupees?']
-            prices_found = []
-            for pattern in price_patterns:
-                matches = re.findall(pattern, content, re.IGNORECASE)
-                prices_found.extend(matches[:5])  # Limit to 5 examples
-            
-            print(f"Price patterns found: {prices_found[:10] if prices_found else 'None'}")
-            
-            all_links = soup.find_all('a', href=True)
-            item_links = [link for link in all_links if any(keyword in link.get('href', '').lower() 
-                                                           for keyword in ['item', 'ad', 'product', 'listing'])]
-            print(f"Potential listing links: {len(item_links)}")
-            
-            # Check for JSON-LD or script data
-            scripts = soup.find_all('script')
-            json_scripts = [script for script in scripts if script.string and 
-                           any(keyword in script.string for keyword in ['json', 'item', 'product'])]
-            print(f"Potential JSON data scripts: {len(json_scripts)}")
-            
-            # Look for common container patterns
-            container_patterns = ['container', 'wrapper', 'main', 'content', 'list', 'grid']
-            containers = []
-            for pattern in container_patterns:
-                elements = soup.find_all(class_=lambda x: x and pattern in x.lower())
-                if elements:
-                    containers.append(f"{pattern}: {len(elements)}")
-            print(f"Container elements: {', '.join(containers) if containers else 'None'}")
+            with open_page(self.html_file_path, self.content) if page is None else contextlib.nullcontext(page) as page:
+                with metrics.stage('read'):
+                    content = bytes(page.buffer)
+                with metrics.stage('parse'):
+                    soup = BeautifulSoup(content, self.parser_backend, from_encoding=page.encoding)
+                with metrics.stage('index'):
+                    self.index = ElementIndex(soup)
+                metrics.count('elements_scanned', len(self.index.position))
+                
+                if self.diagnostics:
+                    self.print_structure_report(page)
             
             return soup
             
         except Exception as e:
+            self.error = str(e)
             print(f"Error analyzing HTML structure: {e}")
             return None
     
-    def extract_from_json_scripts(self, soup):
-        """Try to extract data from JSON scripts embedded in the page"""
-        listings = []
+    def get_index(self, soup):
+        """Return the element index for soup, building it if needed"""
+        if self.index is None or self.index.soup is not soup:
+            self.index = ElementIndex(soup)
+        return self.index
+    
+    def print_structure_report(self, page):
+        """Print the HTML structure analysis from the element index"""
+        index = self.index
         
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if not script.string:
-                continue
-                
-            script_content = script.string.strip()
-            
-            # Look for JSON patterns that might contain listing data
-            json_patterns = [
-                r'window\.__INITIAL_STATE__\s*=\s*({.+?});',
-                r'window\.__APOLLO_STATE__\s*=\s*({.+?});',
-                r'__NEXT_DATA__\s*=\s*({.+?})',
-                r'window\.initialState\s*=\s*({.+?});'
-            ]
-            
-            for pattern in json_patterns:
-                matches = re.findall(pattern, script_content, re.DOTALL)
-                for match in matches:
-                    try:
-                        data = json.loads(match)
-                        # Recursively search for listing-like data
-                        found_listings = self.search_json_for_listings(data)
-                        listings.extend(found_listings)
-                    except:
-                        continue
+        print("="*60)
+        print("HTML STRUCTURE ANALYSIS")
+        print("="*60)
         
-        return listings
-    
-    def search_json_for_listings(self, data, depth=0):
-        """Recursively search JSON data for listing information"""
-        if depth > 3:  # Prevent infinite recursion
-            return []
+        # Basic page info
+        title = index.find('title')
+        print(f"Page Title: {title.text if title else 'Not found'}")
         
-        listings = []
+        # Check for common OLX indicators
+        olx_indicators = [
+            'olx', 'item', 'listing', 'product', 'ad', 'classified'
+        ]
         
-        if isinstance(data, dict):
-            # Look for keys that suggest listing data
-            listing_keys = ['title', 'price', 'location', 'description', 'name']
-            if any(key in data for key in listing_keys):
-                # This might be a listing
-                listing = {
-                    'title': data.get('title', data.get('name', 'N/A')),
-                    'price': str(data.get('price', data.get('amount', 'N/A'))),
-                    'location': data.get('location', data.get('city', 'N/A')),
-                    'date': data.get('date', data.get('createdAt', 'N/A')),
-                    'link': data.get('url', data.get('link', 'N/A')),
-                    'image_url': data.get('image', data.get('thumbnail', 'N/A')),
-                    'seller': 'N/A'
-                }
-                if listing['title'] != 'N/A':
-                    listings.append(listing)
+        found_indicators = []
+        for indicator in olx_indicators:
+            elements = index.class_containing(indicator)
+            if elements:
+                found_indicators.append(f"{indicator}: {len(elements)} elements")
+        
+        print(f"OLX-related elements found: {', '.join(found_indicators) if found_indicators else 'None'}")
+        
+        data_elements = index.data_elements
+        print(f"Elements with data-aut-id: {len(data_elements)}")
+        
+        if data_elements:
+            print("Common data-aut-id values:")
+            for data_id in sorted(index.by_data_aut_id)[:10]:  # Show first 10
+                print(f"  - {data_id}")
+        
+        # Look for price patterns
+        price_patterns = [r'₹\s*[\d,]+', r'Rs\.?\s*[\d,]+', r'\d+\s*rupees?']
+        prices_found = []
+        for pattern in price_patterns:
+            matches = page.findall(pattern, re.IGNORECASE)
+            prices_found.extend(matches[:5])  # Limit to 5 examples
+        
+        print(f"Price patterns found: {prices_found[:10] if prices_found else 'None'}")
+        
+        item_links = index.links_with_keywords(['item', 'ad', 'product', 'listing'])
+        print(f"Potential listing links: {len(item_links)}")
+        
+        # Check for JSON-LD or script data
+        json_scripts = [script for script in index.tag('script') if script.string and 
+                       any(keyword in script.string for keyword in ['json', 'item', 'product'])]
+        print(f"Potential JSON data scripts: {len(json_scripts)}")
+        
+        # Look for common container patterns
+        container_patterns = ['container', 'wrapper', 'main', 'content', 'list', 'grid']
+        containers = []
+        for pattern in container_patterns:
+            elements = index.class_containing(pattern)
+            if elements:
+                containers.append(f"{pattern}: {len(elements)}")
+        print(f"Container elements: {', '.join(containers) if containers else 'None'}")
+    
+    def extract_from_json_scripts(self, soup):
+        """Try to extract data from JSON scripts embedded in the page"""
+        return list(self.iter_json_script_listings(soup))
+    
+    def iter_json_script_listings(self, soup):
+        """Yield listings from JSON scripts as each one is decoded"""
+        scripts = self.get_index(soup).tag('script')
+        self.metrics.count('scripts_scanned', len(scripts))
+        for script in scripts:
+            if not script.string:
+                continue
             
-            # Continue searching in nested objects
-            for value in data.values():
-                listings.extend(self.search_json_for_listings(value, depth + 1))
-                
-        elif isinstance(data, list):
-            for item in data:
-                listings.extend(self.search_json_for_listings(item, depth + 1))
+            for data in decode_embedded_states(script.string, script.get('id'), self.metrics):
+                # Recursively search for listing-like data
+                yield from self.search_json_for_listings(data)
+    
+    def search_json_for_listings(self, data):
+        """Search JSON data for listing information"""
+        return list(self.iter_json_listings(data))
+    
+    def iter_json_listings(self, data):
+        """Yield listings from a decoded state object.
+
+        Registered state paths are tried first; the blind scan over every
+        nested dict only runs when none of them produced a listing. When
+        pages are followed, the first next-page URL is remembered.
+        """
+        if self.follow_pages and self.next_page_url is None:
+            next_page = find_next_page_url(data)
+            if next_page:
+                base = self.html_file_path if is_url(self.html_file_path) else OLX_BASE_URL
+                self.next_page_url = urljoin(base, next_page)
         
-        return listings
+        found = False
+        for path, to_listing in self.json_listing_paths.items():
+            for container in resolve_json_path(data, path):
+                items = container.values() if isinstance(container, dict) else container
+                for item in items:
+                    if isinstance(item, dict):
+                        listing = to_listing(item)
+                        if listing['title'] != 'N/A':
+                            found = True
+                            yield listing
+        if found:
+            return
+        
+        # Walk the tree with an explicit stack of child iterators
+        listing_keys = ['title', 'price', 'location', 'description', 'name']
+        stack = [(iter((data,)), 0)]
+        while stack:
+            children, depth = stack[-1]
+            node = next(children, _END)
+            if node is _END:
+                stack.pop()
+                continue
+            
+            if isinstance(node, dict):
+                # Look for keys that suggest listing data
+                if any(key in node for key in listing_keys):
+                    listing = json_item_to_listing(node)
+                    if listing['title'] != 'N/A':
+                        yield listing
+                if depth < self.json_max_depth:
+                    stack.append((iter(node.values()), depth + 1))
+            elif isinstance(node, list) and depth < self.json_max_depth:
+                stack.append((iter(node), depth + 1))
     
     def extract_with_flexible_selectors(self, soup):
         """Try multiple selector strategies to find listings"""
-        listings = []
+        return list(self.iter_flexible_selector_listings(soup))
+    
+    def iter_flexible_selector_listings(self, soup):
+        """Yield listings from the first selector strategy that finds any"""
+        found = 0
+        index = self.get_index(soup)
         
         # Strategy 1: OLX-specific selectors
-        selectors_v1 = [
-            {'data-aut-id': 'itemBox'},
-            {'class_': lambda x: x and 'item' in x.lower()},
-            {'class_': lambda x: x and 'listing' in x.lower()},
-            {'class_': lambda x: x and 'ad' in x.lower()},
-        ]
+        # Only itemBox is tried: the class-substring selectors that used to
+        # follow it were passed as a literal 'class_' attribute to find_all
+        # and never matched anything.
+        elements = index.with_data_aut_id('itemBox', 'div')
+        if elements:
+            self.log(f"Found {len(elements)} elements with selector: {{'data-aut-id': 'itemBox'}}")
+            for data in self.extract_cards(elements, incremental=True):
+                if data and data.get('title', 'N/A') != 'N/A':
+                    found += 1
+                    yield data
         
-        for selector in selectors_v1:
-            elements = soup.find_all('div', selector)
-            if elements:
-                print(f"Found {len(elements)} elements with selector: {selector}")
-                for elem in elements:
-                    data = self.extract_from_element(elem)
-                    if data and data.get('title', 'N/A') != 'N/A':
-                        listings.append(data)
-                break
+        # Strategies 2 and 3 guess at containers, so their results go through
+        # the listing filter to drop navigation and footer elements
+        listing_filter = self.listing_filter
         
         # Strategy 2: Look for repeated patterns
-        if not listings:
+        if not found:
             # Find elements that repeat frequently (likely listings)
-            all_divs = soup.find_all('div')
             class_counts = {}
             
-            for div in all_divs:
+            for div in index.tag('div'):
                 classes = div.get('class', [])
                 for cls in classes:
                     class_counts[cls] = class_counts.get(cls, 0) + 1
@@ -185,151 +2333,369 @@ class EnhancedOLXParser:
             frequent_classes = [cls for cls, count in class_counts.items() if count >= 3]
             
             for cls in frequent_classes[:5]:  # Try top 5 most frequent classes
-                elements = soup.find_all('div', class_=cls)
+                elements = index.with_class(cls, 'div')
                 if len(elements) >= 3:  # Must have at least 3 elements
-                    print(f"Trying frequent class: {cls} ({len(elements)} elements)")
+                    self.log(f"Trying frequent class: {cls} ({len(elements)} elements)")
                     temp_listings = []
-                    for elem in elements[:10]:  # Test first 10
-                        data = self.extract_from_element(elem)
-                        if data and data.get('title', 'N/A') != 'N/A':
+                    for data in self.extract_cards(elements[:10]):  # Test first 10
+                        if data and listing_filter.accepts(data):
                             temp_listings.append(data)
+                        elif data:
+                            self.metrics.count('listings_rejected')
                     
                     if len(temp_listings) >= 2:  # If we found at least 2 valid listings
-                        listings.extend(temp_listings)
+                        found += len(temp_listings)
+                        yield from temp_listings
                         break
         
         # Strategy 3: Look for links with item/ad patterns
-        if not listings:
-            item_links = soup.find_all('a', href=lambda x: x and any(
-                keyword in x.lower() for keyword in ['item', 'ad', 'product']))
+        if not found:
+            item_links = index.links_with_keywords(['item', 'ad', 'product'])
             
-            print(f"Found {len(item_links)} potential item links")
+            self.log(f"Found {len(item_links)} potential item links")
             for link in item_links[:20]:  # Process first 20 links
                 # Get the parent container
                 parent = link.find_parent(['div', 'li', 'article'])
                 if parent:
                     data = self.extract_from_element(parent)
-                    if data and data.get('title', 'N/A') != 'N/A':
-                        listings.append(data)
+                    if data and listing_filter.accepts(data):
+                        yield data
+                    elif data:
+                        self.metrics.count('listings_rejected')
+    
+    def extract_cards(self, elements, incremental=False):
+        """Extract a run of cards, using learned templates where the structure matches.
+
+        With incremental set and a snapshot loaded, cards already extracted
+        from an earlier save of the same search are reused as they are.
+        """
+        snapshot = self.snapshot if incremental else None
+        keys = [card_key(elem) for elem in elements] if snapshot else [None] * len(elements)
+        fresh = [elem for elem, key in zip(elements, keys)
+                 if not snapshot or key not in snapshot.cards]
+        if snapshot:
+            self.reused_cards += len(elements) - len(fresh)
+        metrics = self.metrics
+        if metrics:
+            metrics.count('cards_scanned', len(elements))
+            metrics.count('cards_reused', len(elements) - len(fresh))
         
-        return listings
+        templates = {}
+        if self.learn_templates:
+            templates = dict(zip(map(id, fresh), CardTemplate.for_cards(fresh, self.selector_plan)))
+        
+        for elem, key in zip(elements, keys):
+            if snapshot and key in snapshot.cards:
+                yield snapshot.cards[key]
+                continue
+            
+            template = templates.get(id(elem))
+            data = template.extract(elem, self.selector_plan, self.fields) if template else None
+            if data is None:
+                data = self.extract_from_element(elem)
+            elif metrics:
+                metrics.count('cards_from_template')
+            if snapshot and key and data and self.fields is None:
+                snapshot.add(key, data)
+            yield data
     
     def extract_from_element(self, element):
-        """Extract listing data from a single element using multiple strategies"""
+        """Extract listing data from a single element using multiple strategies.
+
+        Only the title is read here; the other fields are read from the
+        element when first needed (see Listing), or at once when the
+        parser projects to fields.
+        """
         try:
-            data = {}
-            
-            # Title extraction strategies
-            title_selectors = [
-                '[data-aut-id="itemTitle"]',
-                'h1', 'h2', 'h3', 'h4',
-                '.title', '.name', '.heading',
-                'a[href*="item"]'
-            ]
-            
-            data['title'] = self.find_text_by_selectors(element, title_selectors)
-            
-            # Price extraction
-            price_selectors = [
-                '[data-aut-id="itemPrice"]',
-                '.price', '.amount', '.cost',
-                '*[class*="price"]', '*[id*="price"]'
-            ]
-            
-            price_text = self.find_text_by_selectors(element, price_selectors)
-            if price_text == 'N/A':
-                # Look for price patterns in text
-                text = element.get_text()
-                price_match = re.search(r'₹\s*[\d,]+|Rs\.?\s*[\d,]+', text)
-                price_text = price_match.group() if price_match else 'N/A'
-            
-            data['price'] = price_text
-            
-            # Location extraction
-            location_selectors = [
-                '[data-aut-id="item-location"]',
-                '.location', '.place', '.city',
-                '*[class*="location"]', '*[class*="place"]'
-            ]
-            
-            data['location'] = self.find_text_by_selectors(element, location_selectors)
-            
-            # Date extraction
-            date_selectors = [
-                '[data-aut-id="item-date"]',
-                '.date', '.time', '.posted',
-                '*[class*="date"]', '*[class*="time"]'
-            ]
-            
-            data['date'] = self.find_text_by_selectors(element, date_selectors)
-            
-            # Link extraction
-            link_elem = element.find('a', href=True)
-            if link_elem:
-                href = link_elem.get('href')
-                if href.startswith('/'):
-                    data['link'] = f"https://www.olx.in{href}"
-                else:
-                    data['link'] = href
-            else:
-                data['link'] = 'N/A'
-            
-            # Image extraction
-            img_elem = element.find('img')
-            data['image_url'] = img_elem.get('src', 'N/A') if img_elem else 'N/A'
-            
-            data['seller'] = 'N/A'
-            
+            data = Listing(card=element, plan=self.selector_plan, metrics=self.metrics,
+                           fields=self.fields)
+            data.title  # read now: every strategy checks it
             return data
             
         except Exception as e:
             return None
     
-    def find_text_by_selectors(self, element, selectors):
-        """Try multiple CSS selectors to find text"""
-        for selector in selectors:
-            try:
-                found = element.select_one(selector)
-                if found and found.get_text(strip=True):
-                    return found.get_text(strip=True)
-            except:
-                continue
-        return 'N/A'
-    
     def parse_html_file(self):
         """Main parsing function with comprehensive strategies"""
-        print(f"Parsing HTML file: {self.html_file_path}")
+        seen_keys = NearDuplicateIndex(self.near_duplicates) if self.near_duplicates else None
+        metrics = self.metrics
+        listings = list(metrics.timed('total', self.iter_listings(seen_keys)))
+        if metrics:
+            metrics.count('listings_emitted', len(listings))
+            metrics.count('listings_dropped', metrics.counters.get('listings_extracted', 0) - len(listings))
+        return listings
+    
+    def iter_listings(self, seen_keys=None):
+        """Yield unique listings as they are extracted from the page.
+
+        seen_keys holds compact listing keys and may be shared across pages
+        so duplicates are dropped without keeping earlier listings around.
+        Listings leave as Listing objects holding no card elements, with
+        only the projected fields when the parser has fields.
+        """
+        fields = self.fields
+        for listing in self.iter_unique_listings(seen_keys):
+            yield settle_listing(listing, fields)
+    
+    def iter_unique_listings(self, seen_keys=None):
+        """Yield unique listings, from the parse cache when it has the page"""
+        self.log(f"Parsing HTML file: {self.html_file_path}")
+        
+        if seen_keys is None:
+            seen_keys = set()
+        
+        if self.follow_pages:
+            # The next-page cursor is only known from parsing, so cached
+            # listings cannot be followed
+            if self.cache:
+                self.log("Parse cache bypassed: following pages needs the next-page cursor from a fresh parse")
+            yield from iter_unique(self.iter_page_listings(), seen_keys, self.metrics)
+            if self.next_page_url:
+                paginated = self.iter_paginated_listings(self.follow_pages, self.fetch_options)
+                yield from iter_unique(self.metrics.timed('pagination', paginated), seen_keys, self.metrics)
+            return
+        
+        if not self.cache or self.fields is not None:
+            # Projected listings are incomplete, so they are neither cached
+            # nor served from the cache
+            yield from iter_unique(self.iter_page_listings(), seen_keys, self.metrics)
+            return
+        
+        # The page stays open for parsing after a cache miss, so it is
+        # only read (and for compressed pages decompressed) once
+        try:
+            with self.metrics.stage('cache'):
+                page = open_page(self.html_file_path, self.content)
+                key = self.cache.key_for(page, self.options_key())
+                cached = self.cache.get(key)
+        except (OSError, ValueError, RuntimeError) as e:
+            self.error = str(e)
+            print(f"Error reading HTML file: {e}")
+            return
         
-        soup = self.analyze_html_structure()
+        with page:
+            if cached is not None:
+                self.log(f"Using {len(cached)} cached listings")
+                self.metrics.count('cache_hits')
+                self.metrics.count('listings_extracted', len(cached))
+                yield from iter_unique(cached, seen_keys, self.metrics)
+                return
+            self.metrics.count('cache_misses')
+            
+            page_listings = []
+            collected = iter_collected(self.iter_page_listings(page), page_listings)
+            yield from iter_unique(collected, seen_keys, self.metrics)
+        if not self.error:
+            with self.metrics.stage('cache'):
+                self.cache.put(key, page_listings)
+    
+    def iter_page_listings(self, page=None):
+        """Yield the listings of this page (open, or opened here), deduplicated within the page"""
+        metrics = self.metrics
+        if self.streaming:
+            counted = CountingIterator(metrics.timed('streaming', self.iter_streamed_listings(page)))
+            yield from iter_unique(counted, set(), metrics)
+            metrics.count('listings_extracted', counted.count)
+            if self.snapshot:
+                self.log(f"Reused {self.reused_cards} cards from earlier snapshots")
+                with metrics.stage('snapshots'):
+                    self.snapshots.save(self.snapshot)
+            if counted.count or self.error:
+                return
+            self.log("No itemBox cards or page state found while streaming, parsing the full tree")
+        
+        if page is not None:
+            yield from self.iter_classified_listings(page)
+            return
+        try:
+            page = open_page(self.html_file_path, self.content)
+        except Exception as e:
+            self.error = str(e)
+            print(f"Error analyzing HTML structure: {e}")
+            return
+        with page:
+            yield from self.iter_classified_listings(page)
+    
+    def iter_classified_listings(self, page):
+        """Yield the listings of an open page, running only the strategies its type needs.
+
+        A byte scan classifies the page first. When it has page state, the
+        state is decoded straight from the page text, and the HTML is only
+        parsed if the state covers fewer than coverage_threshold of the
+        itemBox cards, or the page has no itemBox cards to measure against;
+        pages without state skip the JSON strategy.
+        """
+        metrics = self.metrics
+        page_keys = set()
+        run_json_strategy = True
+        if self.coverage_threshold is not None:
+            with metrics.stage('classify'):
+                profile = PageProfile(page)
+            self.page_type = profile.page_type
+            run_json_strategy = False
+            
+            if profile.has_state:
+                counted = CountingIterator(metrics.timed('json_scripts', self.iter_page_state_listings(page)))
+                state_listings = list(iter_unique(counted, page_keys, metrics))
+                metrics.count('listings_extracted', counted.count)
+                yield from state_listings
+                
+                coverage = profile.coverage(len(state_listings))
+                summary = f"{len(state_listings)} listings from page state for {profile.cards} cards"
+                # Without itemBox cards the coverage is unknown: cards of
+                # other layouts may hold ads the state lacks
+                if state_listings and coverage is not None and coverage >= self.coverage_threshold:
+                    self.report_path('state', summary)
+                    self.log("No HTML structure report: the page state covered the page, so the HTML was not parsed")
+                    return
+                reason = "coverage unknown" if coverage is None else f"below {self.coverage_threshold:.0%} coverage"
+                self.report_path('state+selectors', f"{summary}, {reason}")
+            else:
+                self.report_path('selectors', f"no page state, {profile.cards} cards")
+        else:
+            self.report_path('all', "page classification switched off")
+        
+        soup = self.analyze_html_structure(page)
         if not soup:
-            return []
+            return
         
-        all_listings = []
+        if self.snapshots:
+            with metrics.stage('snapshots'):
+                search = search_fingerprint(self.index)
+                self.snapshot = self.snapshots.load(search) if search else None
         
         # Strategy 1: Try to extract from JSON scripts
-        print("\n1. Trying JSON script extraction...")
-        json_listings = self.extract_from_json_scripts(soup)
-        if json_listings:
-            print(f"Found {len(json_listings)} listings from JSON data")
-            all_listings.extend(json_listings)
+        if run_json_strategy:
+            self.log("\n1. Trying JSON script extraction...")
+            counted = CountingIterator(metrics.timed('json_scripts', self.iter_json_script_listings(soup)))
+            yield from iter_unique(counted, page_keys, metrics)
+            metrics.count('listings_extracted', counted.count)
+            if counted.count:
+                self.log(f"Found {counted.count} listings from JSON data")
         
         # Strategy 2: Try flexible HTML selectors
-        print("\n2. Trying flexible HTML selectors...")
-        html_listings = self.extract_with_flexible_selectors(soup)
-        if html_listings:
-            print(f"Found {len(html_listings)} listings from HTML parsing")
-            all_listings.extend(html_listings)
+        self.log("\n2. Trying flexible HTML selectors...")
+        counted = CountingIterator(metrics.timed('selectors', self.iter_flexible_selector_listings(soup)))
+        yield from iter_unique(counted, page_keys, metrics)
+        metrics.count('listings_extracted', counted.count)
+        if counted.count:
+            self.log(f"Found {counted.count} listings from HTML parsing")
         
-        # Remove duplicates based on title
-        seen_titles = set()
-        unique_listings = []
-        for listing in all_listings:
-            title = listing.get('title', '').lower()
-            if title and title != 'n/a' and title not in seen_titles:
-                seen_titles.add(title)
-                unique_listings.append(listing)
+        if self.snapshot:
+            self.log(f"Reused {self.reused_cards} cards from earlier snapshots")
+            with metrics.stage('snapshots'):
+                self.snapshots.save(self.snapshot)
+    
+    def iter_paginated_listings(self, max_pages=DEFAULT_MAX_API_PAGES, fetch_options=None):
+        """Yield listings from the search API pages that follow this page.
+
+        Replaces scrolling and "Load More": starting from the next-page URL
+        in the page state, each JSON response is walked with
+        API_LISTING_PATHS and names the page after it, until max_pages
+        were fetched or a page has no listings. No HTML is involved.
+        """
+        walker = EnhancedOLXParser(self.next_page_url, diagnostics=False, json_max_depth=self.json_max_depth,
+                                   json_listing_paths=API_LISTING_PATHS, follow_pages=max_pages)
+        fetcher = PageFetcher(**(fetch_options or {}))
         
-        return unique_listings
+        for url, body in fetcher.iter_chain(self.next_page_url, lambda url: walker.next_page_url, max_pages):
+            if isinstance(body, FetchError):
+                print(f"Stopped following pages: {body}")
+                return
+            walker.next_page_url = None
+            walker.html_file_path = url
+            try:
+                data = json.loads(body)
+            except ValueError:
+                print(f"Stopped following pages: {url} is not a JSON API response")
+                return
+            
+            counted = CountingIterator(walker.iter_json_listings(data))
+            yield from counted
+            self.metrics.count('api_pages')
+            self.metrics.count('listings_extracted', counted.count)
+            self.log(f"API page {url}: {counted.count} listings")
+            if not counted.count:
+                return
+    
+    def report_path(self, path, reason):
+        """Record and report which extraction path a page took"""
+        self.strategy_path = path
+        self.metrics.count(f'path_{path}')
+        self.log(f"Page type: {self.page_type or 'unclassified'}, extraction path: {path} ({reason})")
+    
+    def iter_page_state_listings(self, page):
+        """Yield listings from the state embedded in the page text, without an HTML tree"""
+        for data in iter_page_states(page.text(), self.metrics):
+            yield from self.iter_json_listings(data)
+    
+    def iter_streamed_listings(self, page=None):
+        """Yield listings while streaming the file, without building a full tree.
+
+        Only itemBox cards and embedded page state are recognised; each card
+        is parsed into its own small tree and dropped once extracted. As in
+        full-tree mode, page state listings come first: on pages whose byte
+        scan finds a state marker, card listings are held (as settled
+        listings, without their trees) until a state script has yielded
+        listings; on other pages they are yielded as they are extracted.
+        """
+        self.log(f"Streaming HTML file: {self.html_file_path}")
+        reader = StreamingPageReader()
+        cards = []
+        card_listings = []
+        try:
+            with open_page(self.html_file_path, self.content) if page is None else contextlib.nullcontext(page) as page:
+                # A compressed page is not decompressed whole just to look
+                # for page state; its card listings wait for the end instead
+                state_pending = bool(page.findall(STATE_MARKER)) if page.loaded else True
+                for chunk in page.iter_text():
+                    reader.feed(chunk)
+                    state_listings = CountingIterator(self.iter_stream_events(reader, cards, card_listings))
+                    yield from state_listings
+                    if state_listings.count:
+                        state_pending = False
+                    if not state_pending:
+                        yield from card_listings
+                        card_listings.clear()
+                reader.close()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Error streaming HTML file: {e}")
+            yield from card_listings
+            return
+        
+        yield from self.iter_stream_events(reader, cards, card_listings)
+        self.extract_streamed_cards(reader, cards, card_listings)
+        yield from card_listings
+    
+    def iter_stream_events(self, reader, cards, card_listings):
+        """Yield page state listings from the reader's events, extracting cards into card_listings"""
+        for kind, payload in reader.pop_events():
+            if kind == 'card':
+                card = BeautifulSoup(payload, self.parser_backend).find('div')
+                self.metrics.count('stream_cards')
+                if card is not None:
+                    cards.append(card)
+                if len(cards) >= STREAM_CARD_BATCH:
+                    self.extract_streamed_cards(reader, cards, card_listings)
+            else:
+                text, script_id = payload
+                self.metrics.count('scripts_scanned')
+                for data in decode_embedded_states(text, script_id, self.metrics):
+                    yield from self.iter_json_listings(data)
+    
+    def extract_streamed_cards(self, reader, cards, card_listings):
+        if not cards:
+            return
+        if self.snapshots and self.snapshot is None:
+            search = reader.search_fingerprint()
+            if search:
+                self.snapshot = self.snapshots.load(search)
+        
+        for data in self.extract_cards(cards, incremental=True):
+            if data and data.get('title', 'N/A') != 'N/A':
+                card_listings.append(settle_listing(data, self.fields))
+        cards.clear()
     
     def save_results(self, listings):
         """Save results to files"""
@@ -347,16 +2713,17 @@ class EnhancedOLXParser:
                 'method': 'enhanced_html_parsing',
                 'source_file': self.html_file_path,
                 'listings': listings
-            }, f, indent=2, ensure_ascii=False)
+            }, f, indent=2, ensure_ascii=False, default=dict)
         
         # Save to CSV
         csv_filename = 'olx_enhanced_parsing.csv'
-        fieldnames = ['title', 'price', 'location', 'date', 'link', 'image_url', 'seller']
         
         with open(csv_filename, 'w', newline='', encoding='utf-8') as f:
+            fieldnames = [field for field in LISTING_FIELDS + DETAIL_FIELDS
+                          if any(field in listing for listing in listings)]
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
-            writer.writerows(listings)
+            writer.writerows(csv_row(listing) for listing in listings)
         
         print(f"\nResults saved:")
         print(f"- JSON: {json_filename}")
@@ -370,13 +2737,916 @@ class EnhancedOLXParser:
         print(f"Source file: {self.html_file_path}")
         
         if listings:
+            columns = ListingColumns()
+            columns.extend(listings, datetime.fromtimestamp(os.path.getmtime(self.html_file_path))
+                           if os.path.exists(self.html_file_path) else datetime.now())
+            print_listing_statistics(columns)
+            
             print(f"\nSample listings:")
             for i, listing in enumerate(listings[:5], 1):
                 print(f"\n{i}. {listing['title']}")
-                print(f"   Price: {listing['price']}")
-                print(f"   Location: {listing['location']}")
+                print(f"   Price: {listing.get('price', 'N/A')}")
+                print(f"   Location: {listing.get('location', 'N/A')}")
 
-def main():
+def compare_backends(html_file, backends=None):
+    """Parse one page with each installed backend and check the listings match"""
+    backends = backends or [b for b in PARSER_BACKENDS if builder_registry.lookup(b)]
+    results = {}
+    for backend in backends:
+        parser = EnhancedOLXParser(html_file, diagnostics=False, parser_backend=backend)
+        results[backend] = parser.parse_html_file()
+    
+    reference = results[backends[0]]
+    parity = {backend: listings == reference for backend, listings in results.items()}
+    for backend, same in parity.items():
+        print(f"{backend}: {len(results[backend])} listings, {'identical' if same else 'DIFFERENT'}")
+    return parity
+
+def collect_html_files(inputs):
+    """Expand directories and glob patterns into a sorted list of page files and bundles"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, name) for name in names
+                             if is_page_name(name) or name.lower().endswith(ARCHIVE_SUFFIXES))
+        else:
+            files.extend(path for path in glob.glob(item) if os.path.isfile(path))
+    return sorted(set(files))
+
+def iter_page_tasks(files):
+    """Yield batch tasks: a path, or (label, bytes) for each page inside a bundle"""
+    for path in files:
+        if path.lower().endswith(ARCHIVE_SUFFIXES):
+            try:
+                yield from iter_archive_pages(path)
+            except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+                yield path, e
+        else:
+            yield path
+
+DEFAULT_FETCH_CACHE_PATH = 'olx_fetch_cache.sqlite'
+DEFAULT_FETCH_CACHE_MAX_MB = 256
+FETCH_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/json;q=0.9,*/*;q=0.8',
+    'Accept-Encoding': 'gzip',
+    'Accept-Language': 'en-IN,en;q=0.9',
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Longest Retry-After wait honoured, in seconds
+MAX_RETRY_AFTER = 60
+
+def is_url(item):
+    return item.startswith(('http://', 'https://'))
+
+class FetchError(Exception):
+    """A page that could not be fetched, after any retries"""
+
+class ConnectionPool:
+    """Idle keep-alive http.client connections per (scheme, host), shared by fetch threads"""
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, scheme, netloc):
+        with self.lock:
+            connections = self.idle.get((scheme, netloc))
+            if connections:
+                return connections.pop()
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(netloc, timeout=self.timeout)
+
+    def release(self, scheme, netloc, connection):
+        with self.lock:
+            self.idle.setdefault((scheme, netloc), []).append(connection)
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle.clear()
+
+class HostRateLimiter:
+    """Spaces out request starts so no host gets more than rate requests per second"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = {}
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self.next_slot.get(host, now))
+        self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class FetchCache:
+    """SQLite store of fetched pages with their ETag/Last-Modified validators.
+
+    Re-fetches send conditional requests; a 304 answer reuses the stored
+    body, so unchanged pages cost a round trip but no download. When the
+    stored bodies exceed max_bytes the least recently used pages are
+    evicted, as in ParseCache. The fetcher calls it from worker threads,
+    one call at a time.
+    """
+
+    def __init__(self, path=DEFAULT_FETCH_CACHE_PATH, max_bytes=DEFAULT_FETCH_CACHE_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB NOT NULL, fetched_at REAL NOT NULL, '
+            'size INTEGER NOT NULL DEFAULT 0, last_used REAL NOT NULL DEFAULT 0)'
+        )
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(pages)')}
+        if 'size' not in columns:
+            # Stores from before eviction: size the stored bodies once
+            self.conn.execute('ALTER TABLE pages ADD COLUMN size INTEGER NOT NULL DEFAULT 0')
+            self.conn.execute('ALTER TABLE pages ADD COLUMN last_used REAL NOT NULL DEFAULT 0')
+            self.conn.execute('UPDATE pages SET size = LENGTH(body), last_used = fetched_at')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used)')
+        self.conn.commit()
+
+    def get(self, url):
+        """(etag, last_modified, body) of the stored copy of url, or None"""
+        with self.lock:
+            row = self.conn.execute('SELECT etag, last_modified, body FROM pages WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            with self.conn:
+                self.conn.execute('UPDATE pages SET last_used = ? WHERE url = ?', (time.time(), url))
+        etag, last_modified, body = row
+        return etag, last_modified, zlib.decompress(body)
+
+    def put(self, url, etag, last_modified, body):
+        compressed = zlib.compress(body, 6)
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                self.conn.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                  (url, etag, last_modified, compressed, now, len(compressed), now))
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used pages until the stored bodies fit in max_bytes"""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with self.conn:
+            rows = self.conn.execute('SELECT url, size FROM pages ORDER BY last_used')
+            stale = []
+            for url, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((url,))
+                total -= size
+            self.conn.executemany('DELETE FROM pages WHERE url = ?', stale)
+
+    def close(self):
+        self.conn.close()
+
+class PageFetcher:
+    """Fetch pages concurrently over pooled keep-alive connections.
+
+    Requests run on http.client in worker threads, at most concurrency at a
+    time and at most per_host_rate per second to any one host. Connection
+    errors and 429/5xx answers are retried with exponential backoff (a
+    Retry-After in seconds is honoured up to MAX_RETRY_AFTER; nothing waits
+    after the last attempt), and pages in the FetchCache are
+    requested conditionally. Backoff waits give up the concurrency slot,
+    and cache reads and writes run in worker threads, off the event loop.
+    """
+
+    def __init__(self, concurrency=8, per_host_rate=2.0, retries=3, backoff=0.5, timeout=30,
+                 cache_path=DEFAULT_FETCH_CACHE_PATH, cache_max_bytes=DEFAULT_FETCH_CACHE_MAX_MB * 1024 * 1024):
+        self.concurrency = concurrency
+        self.per_host_rate = per_host_rate
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = ConnectionPool(timeout)
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.cache = None
+        self.stats = collections.Counter()
+
+    def request(self, url, headers):
+        """One GET on a pooled connection (runs in a worker thread)"""
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        connection = self.pool.acquire(parts.scheme, parts.netloc)
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self.pool.release(parts.scheme, parts.netloc, connection)
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+        return response.status, response, body
+
+    async def fetch(self, url, limit, rate_limiter):
+        """Return the body of url, or a FetchError"""
+        headers = dict(FETCH_HEADERS)
+        cached = await asyncio.to_thread(self.cache.get, url) if self.cache else None
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        
+        host = urlsplit(url).netloc
+        error = None
+        wait = 0
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats['retries'] += 1
+                await asyncio.sleep(wait)
+            async with limit:
+                await rate_limiter.wait(host)
+                try:
+                    status, response, body = await asyncio.to_thread(self.request, url, headers)
+                except (OSError, http.client.HTTPException) as e:
+                    error = FetchError(f"{url}: {e}")
+                    status = None
+            if status is None:
+                wait = self.backoff * 2 ** attempt
+                continue
+            
+            if status == 304 and cached:
+                self.stats['not_modified'] += 1
+                return cached[2]
+            if status == 200:
+                self.stats['fetched'] += 1
+                if self.cache:
+                    await asyncio.to_thread(self.cache.put, url, response.getheader('ETag'),
+                                            response.getheader('Last-Modified'), body)
+                return body
+            error = FetchError(f"{url}: HTTP {status}")
+            if status not in RETRY_STATUSES:
+                break
+            retry_after = response.getheader('Retry-After', '')
+            if retry_after.isdigit():
+                wait = min(int(retry_after), MAX_RETRY_AFTER)
+            else:
+                wait = self.backoff * 2 ** attempt
+        
+        self.stats['failed'] += 1
+        return error
+
+    def iter_chain(self, url, next_url_of, max_pages):
+        """Fetch pages one after another, yielding (url, body_or_error).
+
+        next_url_of(url) is asked for the following page once the consumer
+        has processed the current one, as pagination cursors are only known
+        from the previous response.
+        """
+        limit = asyncio.Semaphore(1)
+        rate_limiter = HostRateLimiter(self.per_host_rate)
+        self.cache = FetchCache(self.cache_path, self.cache_max_bytes) if self.cache_path else None
+        seen = set()
+        try:
+            while url and url not in seen and len(seen) < max_pages:
+                seen.add(url)
+                body = asyncio.run(self.fetch(url, limit, rate_limiter))
+                yield url, body
+                if isinstance(body, FetchError):
+                    return
+                url = next_url_of(url)
+        finally:
+            self.pool.close()
+            if self.cache:
+                self.cache.close()
+    
+    async def fetch_all(self, urls, deliver):
+        """Fetch every url, awaiting deliver(url, body_or_error) as each one completes"""
+        limit = asyncio.Semaphore(self.concurrency)
+        rate_limiter = HostRateLimiter(self.per_host_rate)
+        self.cache = await asyncio.to_thread(FetchCache, self.cache_path, self.cache_max_bytes) if self.cache_path else None
+        
+        async def fetch_one(url):
+            await deliver(url, await self.fetch(url, limit, rate_limiter))
+        
+        try:
+            await asyncio.gather(*(fetch_one(url) for url in urls))
+        finally:
+            self.pool.close()
+            if self.cache:
+                self.cache.close()
+
+def iter_fetched_pages(urls, fetch_options=None, buffer=16):
+    """Yield (url, bytes) batch tasks as pages arrive, straight from the network.
+
+    The fetcher runs its event loop in a background thread; at most buffer
+    fetched pages wait for the parser, which holds the fetches back.
+    A page that could not be fetched is yielded as (url, FetchError).
+    """
+    if not urls:
+        return
+    results = queue.Queue(maxsize=buffer)
+    fetcher = PageFetcher(**(fetch_options or {}))
+    
+    async def deliver(url, body):
+        await asyncio.to_thread(results.put, (url, body))
+    
+    def run():
+        try:
+            asyncio.run(fetcher.fetch_all(urls, deliver))
+        except Exception as e:
+            results.put(('<fetch>', FetchError(str(e))))
+        finally:
+            results.put(_END)
+    
+    thread = threading.Thread(target=run, name='page-fetcher', daemon=True)
+    thread.start()
+    while True:
+        item = results.get()
+        if item is _END:
+            break
+        yield item
+    thread.join()
+    stats = fetcher.stats
+    print(f"Fetched {stats['fetched']} pages, {stats['not_modified']} not modified, "
+          f"{stats['failed']} failed, {stats['retries']} retries")
+
+def fetch_pages(urls, fetch_options=None):
+    """Fetch urls concurrently and return {url: body or FetchError}"""
+    results = {}
+    
+    async def deliver(url, body):
+        results[url] = body
+    
+    if urls:
+        asyncio.run(PageFetcher(**(fetch_options or {})).fetch_all(urls, deliver))
+    return results
+
+DEFAULT_DETAIL_CACHE_PATH = 'olx_details.sqlite'
+DEFAULT_DETAIL_TTL_HOURS = 24
+# Listings whose detail pages are fetched together in batch mode
+DETAIL_BATCH_LISTINGS = 500
+
+# Detail page selectors, used when the page state lacks a field
+DETAIL_SELECTORS = {
+    'seller': [
+        '[data-aut-id="profileCard"] [data-aut-id="profileName"]',
+        '[data-aut-id="sellerName"]', '.seller-name'
+    ],
+    'description': [
+        '[data-aut-id="itemDescriptionContent"]',
+        '[itemprop="description"]', '.description'
+    ],
+    'posted_at': [
+        '[data-aut-id="itemCreationDate"]', 'time'
+    ],
+}
+
+def state_image_url(image):
+    """Largest rendition URL of an image entry from the page state"""
+    if isinstance(image, str):
+        return image
+    if not isinstance(image, dict):
+        return None
+    for size in ('full', 'big', 'medium'):
+        rendition = image.get(size)
+        if isinstance(rendition, dict) and rendition.get('url'):
+            return rendition['url']
+    return image.get('url')
+
+def detail_url(link, base_url=OLX_BASE_URL):
+    """Detail page URL of a listing link, on the origin of the page it came from.
+
+    Card links are made absolute on OLX_BASE_URL when parsed; for pages
+    fetched from elsewhere (a mirror or the stand-in server) they are
+    rebased onto that page's origin.
+    """
+    parts = urlsplit(link)
+    if (parts.scheme, parts.netloc) == urlsplit(OLX_BASE_URL)[:2]:
+        link = parts._replace(scheme='', netloc='').geturl()
+    return urljoin(base_url, link)
+
+def extract_listing_details(content, ad_id=None, name='<detail>'):
+    """Seller, description, full-size images and posted time from a listing detail page.
+
+    The ad is looked up in the page state first (by ad_id, else the only
+    ad there); fields it lacks are filled from DETAIL_SELECTORS and the
+    og:image tags.
+    """
+    details = {}
+    with open_page(name, content) as page:
+        text = page.text()
+    
+    states = list(iter_page_states(text))
+    for state in states:
+        for elements in resolve_json_path(state, 'states.items.elements'):
+            if not isinstance(elements, dict) or not elements:
+                continue
+            ad = elements.get(ad_id)
+            if ad is None and len(elements) == 1:
+                ad = next(iter(elements.values()))
+            if not isinstance(ad, dict):
+                continue
+            if ad.get('description'):
+                details['description'] = ad['description']
+            images = [state_image_url(image) for image in ad.get('images') or []]
+            if any(images):
+                details['images'] = [url for url in images if url]
+            posted = ad.get('created_at_first') or ad.get('created_at') or ad.get('display_date')
+            if posted:
+                details['posted_at'] = posted
+            user_id = ad.get('user_id')
+            for user in resolve_json_path(state, f'states.users.elements.{user_id}') if user_id else ():
+                if isinstance(user, dict) and user.get('name'):
+                    details['seller'] = user['name']
+            break
+    
+    if all(field in details for field in ['seller'] + DETAIL_FIELDS):
+        return details
+    
+    soup = BeautifulSoup(text, 'html.parser')
+    plan = SelectorPlan.shared_for(DETAIL_SELECTORS)
+    for field in plan.fields:
+        if field not in details:
+            found = plan.find_text(soup, field)
+            if found != 'N/A':
+                details[field] = found
+    if 'images' not in details:
+        images = [meta.get('content') for meta in soup.find_all('meta', property='og:image')
+                  if meta.get('content')]
+        if images:
+            details['images'] = images
+    return details
+
+class DetailCache:
+    """SQLite cache of extracted listing details keyed by OLX ad ID, with a TTL"""
+
+    def __init__(self, path=DEFAULT_DETAIL_CACHE_PATH):
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS details ('
+            'key TEXT PRIMARY KEY, details TEXT NOT NULL, fetched_at REAL NOT NULL)'
+        )
+        self.conn.commit()
+
+    def get_fresh(self, keys, ttl):
+        """{key: details} for the keys cached less than ttl seconds ago"""
+        fresh = {}
+        oldest = time.time() - ttl
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, details FROM details WHERE fetched_at >= ? "
+                f"AND key IN ({', '.join('?' * len(chunk))})", [oldest] + chunk
+            )
+            fresh.update((key, json.loads(details)) for key, details in rows)
+        return fresh
+
+    def put_many(self, entries):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO details VALUES (?, ?, ?)',
+                [(key, json.dumps(details, ensure_ascii=False), now) for key, details in entries.items()]
+            )
+
+    def close(self):
+        self.conn.close()
+
+class DetailEnricher:
+    """Adds seller, description, images and posted time from each listing's detail page.
+
+    Detail pages are read from details_dir (saved as <ad id>.html) or
+    fetched concurrently through PageFetcher, and the extracted details
+    are cached per ad ID, so re-runs only visit ads that are new or whose
+    entry is older than ttl_hours.
+    """
+
+    def __init__(self, cache_path=DEFAULT_DETAIL_CACHE_PATH, ttl_hours=DEFAULT_DETAIL_TTL_HOURS,
+                 details_dir=None, fetch_options=None):
+        self.cache = DetailCache(cache_path)
+        self.ttl = ttl_hours * 3600
+        self.details_dir = details_dir
+        self.fetch_options = fetch_options
+        self.stats = collections.Counter()
+
+    def load_saved(self, key):
+        if not self.details_dir:
+            return None
+        path = os.path.join(self.details_dir, f"{key}.html")
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def enrich(self, pages):
+        """Add detail fields to the listings of pages in place; returns how many were enriched.
+
+        pages holds (listings, base_url) pairs, base_url being the page
+        the listings came from; the detail pages missing from the cache
+        are fetched together, in one go.
+        """
+        keyed = [(listing_store_key(listing), listing, base_url)
+                 for listings, base_url in pages for listing in listings]
+        keyed = [(key, listing, base_url) for key, listing, base_url in keyed if key]
+        cached = self.cache.get_fresh({key for key, _, _ in keyed}, self.ttl)
+        self.stats['cached'] += sum(1 for key, _, _ in keyed if key in cached)
+        
+        bodies = {}
+        urls = {}
+        queued = set()
+        for key, listing, base_url in keyed:
+            if key in cached or key in bodies or key in queued:
+                continue
+            saved = self.load_saved(key)
+            link = text_value(listing.get('link'))
+            if saved is not None:
+                bodies[key] = saved
+            elif link and link.startswith(('/', 'http://', 'https://')):
+                urls[detail_url(link, base_url)] = key
+                queued.add(key)
+        for url, body in fetch_pages(list(urls), self.fetch_options).items():
+            if isinstance(body, FetchError):
+                self.stats['failed'] += 1
+            else:
+                bodies[urls[url]] = body
+        
+        extracted = {}
+        for key, content in bodies.items():
+            try:
+                extracted[key] = extract_listing_details(content, key, name=key)
+            except Exception as e:
+                self.stats['failed'] += 1
+                print(f"Could not read details of {key}: {e}")
+        # Pages that yielded no details (an error page, a changed layout)
+        # are left uncached, so the next run tries them again
+        self.cache.put_many({key: details for key, details in extracted.items() if details})
+        self.stats['visited'] += len(extracted)
+        self.stats['empty'] += sum(1 for details in extracted.values() if not details)
+        cached.update(extracted)
+        
+        enriched = 0
+        for key, listing, _ in keyed:
+            details = cached.get(key)
+            if details:
+                listing.update(details)
+                enriched += 1
+        return enriched
+
+    def close(self):
+        self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def print_detail_stats(stats):
+    print(f"Detail pages: {stats['visited']} read ({stats['empty']} without details), "
+          f"{stats['cached']} fresh in cache, {stats['failed']} failed")
+
+def parse_page(task, parser_options, cache_options=None, snapshot_path=None):
+    """Parse one page in a worker process; errors are returned, not raised.
+
+    Returns (label, listings, error, seconds, metrics), metrics being the
+    page's PageMetrics dict (empty unless parser_options enables them).
+    """
+    html_file, content = task if isinstance(task, tuple) else (task, None)
+    started = time.perf_counter()
+    if isinstance(content, FetchError):
+        return html_file, [], f"fetch failed: {content}", 0.0, {}
+    if isinstance(content, Exception):
+        return html_file, [], f"unreadable bundle: {content}", 0.0, {}
+    metrics = {}
+    try:
+        cache = ParseCache.shared(**cache_options) if cache_options else None
+        snapshots = SnapshotStore.shared(snapshot_path) if snapshot_path else None
+        parser = EnhancedOLXParser(html_file, diagnostics=False, cache=cache, snapshots=snapshots,
+                                   content=content, **parser_options)
+        listings = parser.parse_html_file()
+        error = parser.error
+        metrics = parser.metrics.as_dict()
+    except Exception as e:
+        listings, error = [], str(e)
+    return html_file, listings, error, time.perf_counter() - started, metrics
+
+def page_scraped_at(html_file):
+    """When a saved page was scraped: the modification time of its file or bundle"""
+    path = html_file.split('::', 1)[0]
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(path))
+    except OSError:
+        return datetime.now()
+
+def iter_pool_results(pool, fn, tasks, window, *args):
+    """Submit tasks to pool lazily, keeping at most window in flight, yielding results in order"""
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(pool.submit(fn, task, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def run_batch(inputs, workers=None, parser_backend='auto', output_prefix='olx_batch',
+              cache_options=None, snapshot_path=None, streaming=False, columnar=None,
+              store_path=None, near_duplicates=None, filter_rules=None, metrics_options=None,
+              coverage_threshold=DEFAULT_COVERAGE_THRESHOLD, fetch_options=None, follow_pages=0,
+              detail_options=None, fields=None):
+    """Parse many saved or fetched pages across a process pool, streaming merged results.
+
+    Unique listings are appended to <output_prefix>.jsonl and .csv as each
+    page completes; only their compact dedup keys are kept in memory.
+    Pages inside tar/zip bundles are read member by member and handed to
+    the workers as bytes, a few at a time. cache_options (path, max_bytes)
+    enables the on-disk ParseCache, snapshot_path the incremental
+    SnapshotStore, columnar ('parquet' or 'arrow') a typed dataset in
+    <output_prefix>_<format>/ and store_path the cross-run ListingStore.
+    near_duplicates (a similarity threshold) replaces exact-title dedup
+    with a NearDuplicateIndex, and filter_rules points the ListingFilter
+    at a rule file. metrics_options (jsonl_path, prometheus_path) turns on
+    per-page PageMetrics and writes them through a MetricsWriter.
+    coverage_threshold is passed to the page classifier (None runs every
+    strategy on every page). http(s) URLs among inputs are fetched by a
+    PageFetcher (configured by fetch_options) and parsed from memory;
+    follow_pages walks up to that many search API pages after each page.
+    detail_options (cache_path, ttl_hours, details_dir, fetch_options)
+    turns on a DetailEnricher that adds each ad's detail page fields.
+    fields limits extraction and output to those listing fields, and
+    cannot be combined with store_path or columnar.
+    """
+    if fields and (store_path or columnar):
+        # Fields left out would be written as blanks over the stored ones
+        raise ValueError("A field projection cannot be written to the listing store or a columnar dataset")
+    urls = [item for item in inputs if is_url(item)]
+    files = collect_html_files([item for item in inputs if not is_url(item)])
+    if not files and not urls:
+        print("No HTML files found")
+        return {}
+    
+    workers = workers or os.cpu_count() or 1
+    sources = f"{len(files)} files" + (f" and {len(urls)} URLs" if urls else "")
+    print(f"Parsing {sources} with {workers} worker processes ({parser_backend} backend)")
+    if follow_pages and cache_options:
+        print("Parse cache bypassed: following pages needs the next-page cursor from a fresh parse")
+    
+    seen_keys = NearDuplicateIndex(near_duplicates) if near_duplicates else set()
+    columns = ListingColumns()
+    errors = {}
+    pages = 0
+    extracted = 0
+    started = time.perf_counter()
+    jsonl_filename = f'{output_prefix}.jsonl'
+    csv_filename = f'{output_prefix}.csv'
+    fields = projected_fields(fields)
+    fieldnames = list(fields) if fields else LISTING_FIELDS
+    if detail_options:
+        # The detail page also names the seller
+        fieldnames = fieldnames + [field for field in ['seller'] + DETAIL_FIELDS if field not in fieldnames]
+    
+    # Every output is closed on errors and interrupts too, so the Parquet
+    # part gets its footer and the store its last transaction
+    with contextlib.ExitStack() as outputs:
+        sink = outputs.enter_context(ListingSink(jsonl_filename, csv_filename, fieldnames=fieldnames))
+        columnar_sink = None
+        if columnar:
+            columnar_sink = outputs.enter_context(
+                ColumnarListingSink(f'{output_prefix}_{columnar}', columnar))
+        store = outputs.enter_context(ListingStore(store_path)) if store_path else None
+        metrics_writer = outputs.enter_context(MetricsWriter(**metrics_options)) if metrics_options else None
+        enricher = outputs.enter_context(DetailEnricher(**detail_options)) if detail_options else None
+        # Fetched pages come from a thread holding the fetch cache open;
+        # forked workers would inherit its SQLite state and lock the
+        # database, so they are started fresh instead
+        pool_context = None
+        if urls:
+            methods = multiprocessing.get_all_start_methods()
+            pool_context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        pool = outputs.enter_context(ProcessPoolExecutor(max_workers=workers, mp_context=pool_context))
+        parser_options = {'parser_backend': parser_backend, 'streaming': streaming,
+                          'near_duplicates': near_duplicates, 'filter_rules': filter_rules,
+                          'metrics': bool(metrics_writer), 'coverage_threshold': coverage_threshold,
+                          'follow_pages': follow_pages, 'fetch_options': fetch_options,
+                          'fields': fields}
+        tasks = itertools.chain(iter_page_tasks(files), iter_fetched_pages(urls, fetch_options))
+        results = iter_pool_results(pool, parse_page, tasks, workers * 4,
+                                    parser_options, cache_options, snapshot_path)
+        
+        def write_pages(written):
+            """Enrich (when on) and write out completed pages, detail pages fetched together"""
+            if enricher:
+                enricher.enrich([(listings, html_file if is_url(html_file) else OLX_BASE_URL)
+                                 for html_file, listings in written])
+            for html_file, listings in written:
+                scraped_at = page_scraped_at(html_file)
+                if store:
+                    store.upsert(listings, scraped_at)
+                for listing in iter_unique(listings, seen_keys):
+                    sink.write(listing)
+                    columns.append(listing, scraped_at)
+                    if columnar_sink:
+                        columnar_sink.write(listing, scraped_at)
+            sink.flush()
+        
+        # With enrichment on, pages wait until DETAIL_BATCH_LISTINGS
+        # listings are ready, so their detail pages are fetched in one batch
+        waiting = []
+        waiting_listings = 0
+        for html_file, listings, error, seconds, page_metrics in results:
+            pages += 1
+            if metrics_writer and page_metrics:
+                page_metrics['seconds'] = round(seconds, 6)
+                metrics_writer.write(page_metrics)
+            if error:
+                errors[html_file] = error
+                print(f"[{pages}] {html_file}: ERROR {error}")
+                continue
+            
+            extracted += len(listings)
+            print(f"[{pages}] {html_file}: {len(listings)} listings in {seconds:.2f}s")
+            waiting.append((html_file, listings))
+            waiting_listings += len(listings)
+            if not enricher or waiting_listings >= DETAIL_BATCH_LISTINGS:
+                write_pages(waiting)
+                waiting = []
+                waiting_listings = 0
+        write_pages(waiting)
+        
+        stored = store.count() if store else None
+    
+    elapsed = time.perf_counter() - started
+    print(f"\n{'='*50}")
+    print("BATCH SUMMARY")
+    print(f"{'='*50}")
+    print(f"Pages: {pages} ({len(errors)} failed) in {elapsed:.2f}s")
+    print(f"Throughput: {pages / elapsed:.1f} pages/s, {extracted / elapsed:.1f} listings/s")
+    print(f"Listings: {extracted} extracted, {sink.written} unique")
+    if enricher:
+        print_detail_stats(enricher.stats)
+    if len(columns):
+        print_listing_statistics(columns)
+    print(f"\nResults appended to:")
+    print(f"- JSONL: {jsonl_filename}")
+    print(f"- CSV: {csv_filename}")
+    if columnar_sink and columnar_sink.written:
+        print(f"- {columnar.title()}: {columnar_sink.path}")
+    if store:
+        print(f"- Listing store: {store_path} ({stored} listings across runs)")
+    if metrics_options:
+        for label, path in (('Metrics', metrics_options.get('jsonl_path')),
+                            ('Prometheus textfile', metrics_options.get('prometheus_path'))):
+            if path:
+                print(f"- {label}: {path}")
+    return errors
+
+def parse_fields(value):
+    """--fields value: comma-separated listing fields"""
+    try:
+        return projected_fields([field.strip() for field in value.split(',') if field.strip()])
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Enhanced OLX HTML Parser")
+    parser.add_argument('inputs', nargs='*',
+                        help="pages (.html, .mhtml, optionally .gz/.bz2/.zst), tar/zip bundles, "
+                             "directories, glob patterns or http(s) URLs to parse in batch mode "
+                             "(omit for interactive mode)")
+    parser.add_argument('--urls', default=None, metavar='FILE',
+                        help="file of search/listing URLs to fetch, one per line")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="simultaneous requests when fetching URLs (default: 8)")
+    parser.add_argument('--rate', type=float, default=2.0,
+                        help="requests per second to any one host, 0 for no limit (default: 2)")
+    parser.add_argument('--retries', type=int, default=3,
+                        help="retries for failed requests and 429/5xx answers (default: 3)")
+    parser.add_argument('--fetch-cache', default=DEFAULT_FETCH_CACHE_PATH,
+                        help="store of fetched pages used for conditional requests "
+                             f"(default: {DEFAULT_FETCH_CACHE_PATH})")
+    parser.add_argument('--fetch-cache-size', type=int, default=DEFAULT_FETCH_CACHE_MAX_MB,
+                        help=f"fetch cache size limit in MB (default: {DEFAULT_FETCH_CACHE_MAX_MB})")
+    parser.add_argument('--follow-pages', type=int, default=0, metavar='N',
+                        help="after each page, fetch up to N further result pages from the search "
+                             "API named in its page state, instead of scrolling and re-saving")
+    parser.add_argument('--enrich', action='store_true',
+                        help="add seller, description, full-size images and posted time from each "
+                             "ad's detail page, fetching only ads that are new or stale in the cache")
+    parser.add_argument('--detail-ttl', type=float, default=DEFAULT_DETAIL_TTL_HOURS, metavar='HOURS',
+                        help="refetch detail pages cached longer ago than this "
+                             f"(default: {DEFAULT_DETAIL_TTL_HOURS})")
+    parser.add_argument('--details-dir', default=None, metavar='DIR',
+                        help="read saved detail pages named <ad id>.html from DIR before fetching")
+    parser.add_argument('--detail-cache', default=DEFAULT_DETAIL_CACHE_PATH,
+                        help=f"cache of extracted ad details (default: {DEFAULT_DETAIL_CACHE_PATH})")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes for batch mode (default: number of cores)")
+    parser.add_argument('--backend', default='auto', choices=['auto'] + PARSER_BACKENDS,
+                        help="BeautifulSoup parser backend for batch mode (default: auto)")
+    parser.add_argument('--output', default='olx_batch',
+                        help="output file prefix for batch mode; .jsonl and .csv are appended to "
+                             "(default: olx_batch)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="extract itemBox cards while reading each page instead of "
+                             "building a full tree (bounded memory for very large pages)")
+    parser.add_argument('--columnar', choices=list(ColumnarListingSink.FORMATS),
+                        help="also write typed columns to a parquet/arrow dataset directory "
+                             "<output>_<format>/, one part file per run (needs pyarrow)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                        help=f"parse cache database for batch mode (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_MAX_MB,
+                        help=f"parse cache size limit in MB (default: {DEFAULT_CACHE_MAX_MB})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="parse every page even if a cached result exists")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="empty the parse cache before running")
+    parser.add_argument('--incremental', action='store_true',
+                        help="reuse cards already extracted from earlier saves of the same search")
+    parser.add_argument('--snapshots', default=DEFAULT_SNAPSHOT_PATH,
+                        help=f"card store for --incremental (default: {DEFAULT_SNAPSHOT_PATH})")
+    parser.add_argument('--store', nargs='?', const=DEFAULT_STORE_PATH, default=None,
+                        help="upsert listings into a SQLite database kept across runs, with "
+                             f"first/last-seen times and price history (default: {DEFAULT_STORE_PATH})")
+    parser.add_argument('--near-duplicates', nargs='?', type=float, const=0.7, default=None,
+                        metavar='THRESHOLD',
+                        help="drop reposts with small title edits using MinHash similarity of "
+                             "titles plus price, location and image checks (default threshold: 0.7)")
+    parser.add_argument('--filter-rules', default=None, metavar='PATH',
+                        help="file of phrases (one per line) whose titles are rejected as "
+                             "navigation elements, replacing the built-in list")
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                        help="append per-page stage timings and counters to a JSON-lines file")
+    parser.add_argument('--prometheus', default=None, metavar='PATH',
+                        help="write metric totals to a Prometheus textfile (node_exporter collector)")
+    parser.add_argument('--coverage', type=float, default=DEFAULT_COVERAGE_THRESHOLD, metavar='SHARE',
+                        help="skip card extraction on pages whose embedded state covers at least "
+                             f"this share of the itemBox cards (default: {DEFAULT_COVERAGE_THRESHOLD})")
+    parser.add_argument('--all-strategies', action='store_true',
+                        help="run every extraction strategy instead of classifying each page first")
+    parser.add_argument('--fields', type=parse_fields, default=None, metavar='LIST',
+                        help="comma-separated listing fields to extract and write, e.g. "
+                             "title,price,link; card selectors for other fields are skipped. "
+                             "Not with --store or --columnar; --enrich needs link "
+                             f"(fields: {', '.join(LISTING_FIELDS + DETAIL_FIELDS)})")
+    return parser
+
+def main(argv=None):
+    arg_parser = build_arg_parser()
+    args = arg_parser.parse_args(argv)
+    if args.fields:
+        if args.store or args.columnar:
+            arg_parser.error("--fields cannot be combined with --store or --columnar, "
+                             "which would blank the fields left out")
+        if args.enrich and 'link' not in args.fields:
+            arg_parser.error("--enrich needs the link field in --fields to find detail pages")
+    if args.clear_cache:
+        ParseCache(args.cache).clear()
+        print(f"Cleared parse cache: {args.cache}")
+    
+    coverage_threshold = None if args.all_strategies else args.coverage
+    metrics_options = None
+    if args.metrics or args.prometheus:
+        metrics_options = {'jsonl_path': args.metrics, 'prometheus_path': args.prometheus}
+    
+    if args.urls:
+        with open(args.urls, 'r', encoding='utf-8') as f:
+            args.inputs += [line.strip() for line in f if is_url(line.strip())]
+    
+    fetch_options = {'concurrency': args.concurrency, 'per_host_rate': args.rate,
+                     'retries': args.retries, 'cache_path': args.fetch_cache,
+                     'cache_max_bytes': args.fetch_cache_size * 1024 * 1024}
+    detail_options = None
+    if args.enrich:
+        detail_options = {'cache_path': args.detail_cache, 'ttl_hours': args.detail_ttl,
+                          'details_dir': args.details_dir, 'fetch_options': fetch_options}
+    if args.inputs:
+        cache_options = None
+        if not args.no_cache:
+            cache_options = {'path': args.cache, 'max_bytes': args.cache_size * 1024 * 1024}
+        snapshot_path = args.snapshots if args.incremental else None
+        run_batch(args.inputs, args.workers, args.backend, args.output, cache_options,
+                  snapshot_path, args.streaming, args.columnar, args.store, args.near_duplicates,
+                  args.filter_rules, metrics_options, coverage_threshold, fetch_options,
+                  args.follow_pages, detail_options, args.fields)
+        return
+    if args.clear_cache:
+        return
+    
     print("Enhanced OLX HTML Parser")
     print("="*40)
     print("This parser can handle various OLX page structures")
@@ -395,11 +3665,25 @@ def main():
         print("4. Make sure to save as 'Webpage, Complete' if given options")
         return
     
-    parser = EnhancedOLXParser(html_file)
+    parser = EnhancedOLXParser(html_file, near_duplicates=args.near_duplicates,
+                               filter_rules=args.filter_rules, metrics=bool(metrics_options),
+                               coverage_threshold=coverage_threshold, follow_pages=args.follow_pages,
+                               fetch_options=fetch_options, fields=args.fields)
     listings = parser.parse_html_file()
+    if metrics_options:
+        with MetricsWriter(**metrics_options) as writer:
+            writer.write(parser.metrics.as_dict())
     
     if listings:
+        if detail_options:
+            with DetailEnricher(**detail_options) as enricher:
+                enricher.enrich([(listings, html_file if is_url(html_file) else OLX_BASE_URL)])
+                print_detail_stats(enricher.stats)
         parser.save_results(listings)
+        if args.store:
+            with ListingStore(args.store) as store:
+                store.upsert(listings, page_scraped_at(html_file))
+                print(f"- Listing store: {args.store} ({store.count()} listings across runs)")
     else:
         print("\nNo listings found. This could mean:")
         print("1. The page uses heavy JavaScript (try saving after scrolling)")
@@ -425,8 +3709,9 @@ import requests
 from urllib.parse import urljoin, urlparse
 
 class ManualComprehensiveScraper:
-    def __init__(self):
+    def __init__(self, parser_backend='html.parser'):
         self.base_url = "https://www.olx.in"
+        self.parser_backend = parser_backend  # 'lxml' or 'html5lib' also work
         self.all_listings = []
         
     def get_detailed_instructions(self):
@@ -477,7 +3762,7 @@ class ManualComprehensiveScraper:
             with open(html_file, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            soup = BeautifulSoup(content, 'html.parser')
+            soup = BeautifulSoup(content, self.parser_backend)
             
             print(f"\n{'='*60}")
             print("COMPREHENSIVE HTML ANALYSIS")
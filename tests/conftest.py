@@ -0,0 +1,56 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+# query_File.py and benchmark.py are plain scripts at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmark import VARIANTS, generate_page
+
+
+@pytest.fixture(scope='session')
+def fixture_pages(tmp_path_factory):
+    """Generated result pages of every layout, with and without embedded state"""
+    directory = tmp_path_factory.mktemp('pages')
+    pages = []
+    for variant in VARIANTS:
+        for state in (False, True):
+            if variant == 'state' and state:
+                continue
+            path = directory / f"{variant}{'-state' if state else ''}.html"
+            path.write_text(generate_page(60, variant, state=state, noise=20), encoding='utf-8')
+            pages.append(str(path))
+    return pages
+
+
+@pytest.fixture
+def stand_in_server():
+    """Start `benchmark.py --serve` with the given options; returns its base URL"""
+    servers = []
+
+    def start(*options):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'benchmark.py'), '--serve', str(port),
+                                   '--cards', '20', *options], stdout=subprocess.DEVNULL)
+        servers.append(server)
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return f"http://127.0.0.1:{port}"
+            except OSError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise
+                time.sleep(0.05)
+
+    yield start
+    for server in servers:
+        server.terminate()
+        server.wait()
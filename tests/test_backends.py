@@ -0,0 +1,27 @@
+import pytest
+from bs4.builder import builder_registry
+
+from query_File import PARSER_BACKENDS, EnhancedOLXParser, resolve_parser_backend
+
+INSTALLED = [backend for backend in PARSER_BACKENDS if builder_registry.lookup(backend)]
+
+
+def parse(path, backend, coverage_threshold):
+    parser = EnhancedOLXParser(path, diagnostics=False, parser_backend=backend,
+                               coverage_threshold=coverage_threshold)
+    return [dict(listing) for listing in parser.parse_html_file()]
+
+
+def test_auto_prefers_faster_backends():
+    expected = 'lxml' if 'lxml' in INSTALLED else 'html.parser'
+    assert resolve_parser_backend('auto') == expected
+
+
+@pytest.mark.skipif(len(INSTALLED) < 2, reason="only one parser backend installed")
+@pytest.mark.parametrize('coverage_threshold', [1.0, None], ids=['classified', 'all-strategies'])
+def test_backends_yield_identical_listings(fixture_pages, coverage_threshold):
+    for path in fixture_pages:
+        reference = parse(path, INSTALLED[0], coverage_threshold)
+        assert reference, path
+        for backend in INSTALLED[1:]:
+            assert parse(path, backend, coverage_threshold) == reference, (path, backend)
@@ -0,0 +1,51 @@
+import pytest
+
+from benchmark import generate_page, synthetic_ads, time_stages
+from query_File import EnhancedOLXParser
+
+
+# (listings, extraction path) each 50-card layout should give with the default
+# noise; the repeated-class strategy tests its first 10 cards and the link
+# strategy its first 20 links, so a layout falling through to the wrong
+# strategy changes the count
+EXPECTED = {
+    'itembox': (50, 'selectors'),
+    'classes': (10, 'selectors'),
+    'links': (20, 'selectors'),
+    'state': (50, 'state+selectors'),
+}
+
+
+@pytest.mark.parametrize('variant', sorted(EXPECTED))
+def test_each_variant_reaches_its_strategy(tmp_path, variant):
+    html_file = tmp_path / f'{variant}.html'
+    html_file.write_text(generate_page(50, variant, noise=200), encoding='utf-8')
+    timings, listings, path = time_stages(str(html_file), 'html.parser', str(tmp_path))
+    assert (listings, path) == EXPECTED[variant]
+    assert timings['parse'] > 0 or variant == 'state'
+    assert timings['dedup'] > 0
+
+
+def test_classes_variant_reads_the_cards(tmp_path):
+    html_file = tmp_path / 'classes.html'
+    html_file.write_text(generate_page(50, 'classes', noise=200), encoding='utf-8')
+    listings = EnhancedOLXParser(str(html_file), diagnostics=False).parse_html_file()
+    assert [listing['title'] for listing in listings] == [ad['title'] for ad in synthetic_ads(10)]
+
+
+def test_page_state_without_itembox_cards_keeps_the_html_strategies(tmp_path):
+    # A one-ad page state says nothing about how many cards of another layout
+    # the page holds, so the repeated-class cards must still be read
+    state_page = generate_page(1, 'state', seed=2)
+    script = state_page[state_page.index('<script>window.__INITIAL_STATE__'):]
+    script = script[:script.index('</script>') + len('</script>')]
+    html_file = tmp_path / 'classes+state.html'
+    html_file.write_text(generate_page(10, 'classes', noise=200).replace('</head>', script + '</head>'),
+                         encoding='utf-8')
+
+    parser = EnhancedOLXParser(str(html_file), diagnostics=False)
+    listings = [dict(listing) for listing in parser.parse_html_file()]
+    assert parser.strategy_path == 'state+selectors'
+    assert len(listings) == 11
+    all_strategies = EnhancedOLXParser(str(html_file), diagnostics=False, coverage_threshold=None)
+    assert [dict(listing) for listing in all_strategies.parse_html_file()] == listings
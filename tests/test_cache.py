@@ -0,0 +1,32 @@
+from query_File import EnhancedOLXParser, ParseCache
+
+
+def test_cache_over_max_bytes_drops_least_recently_used(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache.sqlite'), max_bytes=10 ** 9)
+    listings = [{'title': f'Car cover {i} ' + 'x' * 200 + str(i * 7919)} for i in range(20)]
+    cache.put('a', listings)
+    size = cache.conn.execute('SELECT size FROM pages').fetchone()[0]
+    cache.max_bytes = 2 * size + size // 2
+    cache.put('b', listings)
+    assert cache.get('a') is not None  # a is now more recently used than b
+    cache.put('c', listings)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+
+def test_parser_options_are_part_of_the_key(fixture_pages, tmp_path):
+    rules = tmp_path / 'rules.txt'
+    rules.write_text('login\nmin_length: 3\n', encoding='utf-8')
+    page = next(path for path in fixture_pages if path.endswith('classes.html'))
+    cache = ParseCache(str(tmp_path / 'cache.sqlite'))
+
+    def cache_misses(**options):
+        parser = EnhancedOLXParser(page, diagnostics=False, cache=cache, metrics=True, **options)
+        parser.parse_html_file()
+        return parser.metrics.counters.get('cache_misses', 0)
+
+    assert cache_misses() == 1
+    assert cache_misses() == 0
+    assert cache_misses(parser_backend='html5lib') == 1
+    assert cache_misses(filter_rules=str(rules)) == 1
+    assert cache_misses(filter_rules=str(rules)) == 0
@@ -0,0 +1,53 @@
+import json
+
+from query_File import DetailCache, DetailEnricher, detail_url, run_batch
+
+
+def test_detail_url_follows_the_page_origin():
+    link = 'https://www.olx.in/item/car-cover-iid-1700000001'
+    assert detail_url(link) == link
+    assert detail_url(link, 'http://127.0.0.1:8000/state-50.html') == 'http://127.0.0.1:8000/item/car-cover-iid-1700000001'
+    assert detail_url('https://example.com/ad/1', 'http://127.0.0.1:8000/') == 'https://example.com/ad/1'
+
+
+def test_batch_enriches_state_and_card_listings(stand_in_server, tmp_path):
+    base = stand_in_server()
+    prefix = str(tmp_path / 'batch')
+    fetch_options = {'per_host_rate': 0, 'cache_path': None}
+    errors = run_batch([f"{base}/state-20.html", f"{base}/itembox-20.html"], workers=1,
+                       output_prefix=prefix, fetch_options=fetch_options,
+                       detail_options={'cache_path': str(tmp_path / 'details.sqlite'),
+                                       'fetch_options': fetch_options})
+    assert errors == {}
+    with open(f'{prefix}.jsonl', encoding='utf-8') as f:
+        listings = [json.loads(line) for line in f]
+    assert len(listings) == 20
+    assert all(listing['seller'] == 'Rahul Motors' and listing['description'] for listing in listings)
+
+
+def test_pages_without_details_are_not_cached(tmp_path):
+    details_dir = tmp_path / 'details'
+    details_dir.mkdir()
+    (details_dir / '1700000001.html').write_text('<html><body>Service unavailable</body></html>')
+    listing = {'title': 'Car cover', 'link': 'https://www.olx.in/item/car-cover-iid-1700000001'}
+    cache_path = str(tmp_path / 'details.sqlite')
+    with DetailEnricher(cache_path, details_dir=str(details_dir)) as enricher:
+        assert enricher.enrich([([listing], 'https://www.olx.in')]) == 0
+        assert enricher.stats['empty'] == 1
+    cache = DetailCache(cache_path)
+    assert cache.get_fresh(['1700000001'], 3600) == {}
+    cache.close()
+
+
+def test_projected_batch_keeps_the_enriched_seller(stand_in_server, tmp_path):
+    import csv
+    base = stand_in_server()
+    prefix = str(tmp_path / 'batch')
+    fetch_options = {'per_host_rate': 0, 'cache_path': None}
+    run_batch([f"{base}/itembox-20.html"], workers=1, output_prefix=prefix, fetch_options=fetch_options,
+              fields=('title', 'link'), detail_options={'cache_path': str(tmp_path / 'details.sqlite'),
+                                                        'fetch_options': fetch_options})
+    with open(f'{prefix}.csv', encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 20
+    assert all(row['seller'] == 'Rahul Motors' and row['description'] for row in rows)
@@ -0,0 +1,133 @@
+import asyncio
+import socket
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import query_File
+from query_File import FetchCache, FetchError, PageFetcher, fetch_pages
+
+
+def refused_url():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{probe.getsockname()[1]}/gone.html"
+
+
+def recorded_waits(monkeypatch, url, **options):
+    """Fetch url once, returning (result, the backoff sleeps it took)"""
+    waits = []
+    sleep = asyncio.sleep
+
+    async def recording_sleep(delay):
+        waits.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(query_File.asyncio, 'sleep', recording_sleep)
+    results = fetch_pages([url], {'per_host_rate': 0, 'cache_path': None, **options})
+    return results[url], waits
+
+
+def test_fetches_pages_and_revalidates_from_the_cache(stand_in_server, tmp_path):
+    base = stand_in_server()
+    urls = [f"{base}/itembox-20.html", f"{base}/state-20.html"]
+    options = {'per_host_rate': 0, 'cache_path': str(tmp_path / 'fetch.sqlite')}
+    first = fetch_pages(urls, options)
+    assert all(b'__INITIAL_STATE__' in first[url] for url in urls)
+
+    fetcher = PageFetcher(**options)
+    second = {}
+
+    async def deliver(url, body):
+        second[url] = body
+
+    asyncio.run(fetcher.fetch_all(urls, deliver))
+    assert second == first
+    assert fetcher.stats['not_modified'] == 2 and fetcher.stats['fetched'] == 0
+
+
+def test_injected_failures_are_retried(stand_in_server):
+    base = stand_in_server('--fail-every', '2')
+    urls = [f"{base}/itembox-20.html", f"{base}/links-20.html", f"{base}/classes-20.html"]
+    fetcher = PageFetcher(per_host_rate=0, backoff=0.01, cache_path=None)
+    results = {}
+
+    async def deliver(url, body):
+        results[url] = body
+
+    asyncio.run(fetcher.fetch_all(urls, deliver))
+    assert not any(isinstance(body, FetchError) for body in results.values())
+    assert fetcher.stats['retries'] >= 1
+
+
+def test_backoff_does_not_hold_the_concurrency_slot(stand_in_server):
+    base = stand_in_server()
+    refused = refused_url()
+    fetcher = PageFetcher(concurrency=1, per_host_rate=0, retries=1, backoff=0.5, cache_path=None)
+    delivered = {}
+
+    async def deliver(url, body):
+        delivered[url] = (time.monotonic(), body)
+
+    started = time.monotonic()
+    asyncio.run(fetcher.fetch_all([refused, f"{base}/itembox-20.html"], deliver))
+    finished, body = delivered[f"{base}/itembox-20.html"]
+    assert not isinstance(body, FetchError)
+    assert finished - started < 0.4
+    assert isinstance(delivered[refused][1], FetchError)
+
+
+def test_no_backoff_after_the_last_attempt(monkeypatch):
+    body, waits = recorded_waits(monkeypatch, refused_url(), retries=2, backoff=0.5)
+    assert isinstance(body, FetchError)
+    assert waits == [0.5, 1.0]
+
+
+def test_retry_after_is_capped(monkeypatch):
+    class Busy(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(503)
+            self.send_header('Retry-After', '86400')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Busy)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/busy.html"
+        body, waits = recorded_waits(monkeypatch, url, retries=2)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert isinstance(body, FetchError)
+    assert waits == [query_File.MAX_RETRY_AFTER] * 2
+
+
+def test_fetch_cache_over_max_bytes_drops_least_recently_used(tmp_path):
+    cache = FetchCache(str(tmp_path / 'fetch.sqlite'), max_bytes=10 ** 9)
+    body = ''.join(f'<li>Car cover {i * 7919}</li>' for i in range(200)).encode('utf-8')
+    cache.put('a', '"a"', None, body)
+    size = cache.conn.execute('SELECT size FROM pages').fetchone()[0]
+    cache.max_bytes = 2 * size + size // 2
+    cache.put('b', '"b"', None, body)
+    assert cache.get('a') == ('"a"', None, body)  # a is now more recently used than b
+    cache.put('c', '"c"', None, body)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+
+def test_fetch_cache_sizes_stores_from_before_eviction(tmp_path):
+    path = str(tmp_path / 'fetch.sqlite')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, '
+                     'body BLOB NOT NULL, fetched_at REAL NOT NULL)')
+        conn.execute('INSERT INTO pages VALUES (?, ?, ?, ?, ?)', ('old', '"x"', None, b'x' * 100, 1.0))
+    conn.close()
+    cache = FetchCache(path, max_bytes=50)
+    cache.put('new', '"y"', None, b'')
+    assert cache.get('old') is None
+    assert cache.get('new') == ('"y"', None, b'')
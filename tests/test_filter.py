@@ -0,0 +1,33 @@
+import pytest
+
+from query_File import ListingFilter
+
+
+@pytest.mark.parametrize('title', [
+    'Selling car cover', 'Home theatre 5.1 Sony', 'Car cover with customer support',
+    'Buy 1 get 1 car cover', 'Helmet for sale', 'About 2 years old bike cover',
+])
+def test_real_ads_are_accepted(title):
+    assert ListingFilter().accepts({'title': title})
+
+
+@pytest.mark.parametrize('title', [
+    'Home', 'Help & Support', 'Privacy Policy', 'ABOUT US', 'Post ad', 'All Categories',
+    'Terms & Conditions', 'Sell', 'N/A', 'Car',
+])
+def test_navigation_is_rejected(title):
+    assert not ListingFilter().accepts({'title': title})
+
+
+def test_rule_file(tmp_path):
+    rules = tmp_path / 'rules.txt'
+    rules.write_text('# site chrome\nmy account\n\nsaved searches  # header links\nmin_length: 3\n',
+                     encoding='utf-8')
+    listing_filter = ListingFilter.from_file(str(rules))
+    assert listing_filter.phrases == ['my account', 'saved searches']
+    assert listing_filter.min_length == 3
+    assert not listing_filter.accepts({'title': 'My  Account'})
+    assert not listing_filter.accepts({'title': 'Saved searches'})
+    assert listing_filter.accepts({'title': 'Home'})
+    assert listing_filter.accepts({'title': 'Car'})
+    assert not listing_filter.accepts({'title': 'TV'})
@@ -0,0 +1,37 @@
+from query_File import NearDuplicateIndex
+
+
+def ad(title, price='₹ 1,000', image='https://img.example/a.jpg'):
+    return {'title': title, 'price': price, 'location': 'Kothrud, Pune', 'image_url': image}
+
+
+def test_shared_image_alone_is_not_a_duplicate():
+    index = NearDuplicateIndex(0.7)
+    assert index.add(ad('Wooden study table with drawer'))
+    assert index.add(ad('Samsung washing machine, fully automatic'))
+    assert len(index) == 2
+
+
+def test_shared_image_lowers_the_title_bar():
+    title = 'Royal Enfield Classic 350 well maintained, single owner'
+    edited = 'Royal Enfield Classic 350 single owner, new tyres'
+    assert NearDuplicateIndex(0.7).add(ad(title)) is True
+    without_image = NearDuplicateIndex(0.7)
+    without_image.add(ad(title, image='N/A'))
+    assert without_image.add(ad(edited, image='N/A'))
+    with_image = NearDuplicateIndex(0.7)
+    with_image.add(ad(title))
+    assert not with_image.add(ad(edited))
+
+
+def test_shared_image_with_contradicting_price_is_kept():
+    index = NearDuplicateIndex(0.7)
+    index.add(ad('iPhone 12 128GB blue'))
+    assert index.add(ad('iPhone 12 128GB blue', price='₹ 5,000'))
+
+
+def test_exact_repost_is_a_duplicate():
+    index = NearDuplicateIndex(0.7)
+    index.add(ad('iPhone 12 128GB blue', image='N/A'))
+    assert not index.add(ad('iPhone 12 128GB blue!', image='N/A'))
+    assert len(index.signatures) == index.num_perm
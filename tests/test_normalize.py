@@ -0,0 +1,49 @@
+from datetime import date, datetime
+
+import pytest
+
+from query_File import normalize_date, normalize_location, normalize_price
+
+SCRAPED_AT = datetime(2024, 3, 15, 12, 0)
+
+
+@pytest.mark.parametrize('text, paise', [
+    ('₹ 1,299', 129900),
+    ('Rs. 450', 45000),
+    ('₹ 5.5 Lakh', 55000000),
+    ('₹ 12 Lakhs', 120000000),
+    ('₹ 1.2 Cr', 1200000000),
+    ('₹ 2 Crore', 2000000000),
+    ('12abc', 1200),
+    ('N/A', None),
+    (None, None),
+    ('Price on request', None),
+])
+def test_normalize_price(text, paise):
+    assert normalize_price(text) == paise
+
+
+@pytest.mark.parametrize('text, posted', [
+    ('Today', date(2024, 3, 15)),
+    ('Just now', date(2024, 3, 15)),
+    ('Yesterday', date(2024, 3, 14)),
+    ('3 days ago', date(2024, 3, 12)),
+    ('2 weeks ago', date(2024, 3, 1)),
+    ('5 hours ago', date(2024, 3, 15)),
+    ('1 month ago', date(2024, 2, 14)),
+    ('1 year ago', date(2023, 3, 16)),
+    ('2 yrs ago', date(2022, 3, 16)),
+    ('2024-02-12T10:15:00+05:30', date(2024, 2, 12)),
+    ('12 Feb 2024', date(2024, 2, 12)),
+    ('Jan 05', date(2024, 1, 5)),
+    ('Dec 20', date(2023, 12, 20)),
+    ('N/A', None),
+    ('someday', None),
+])
+def test_normalize_date(text, posted):
+    assert normalize_date(text, SCRAPED_AT) == posted
+
+
+def test_normalize_location():
+    assert normalize_location('  kothrud ,  pune ') == 'Kothrud, Pune'
+    assert normalize_location('N/A') is None
@@ -0,0 +1,56 @@
+from benchmark import generate_page
+from query_File import ITEMBOX_MARKER, PageProfile, PageSource, iter_page_states
+
+
+def test_utf16_page_is_scanned_as_text():
+    html = generate_page(30, 'itembox', state=True).replace('charset="utf-8"', 'charset="utf-16"')
+    page = PageSource(html.encode('utf-16'), 'page.html')
+    assert not page.ascii_compatible
+    assert len(page.findall(ITEMBOX_MARKER)) == 30
+    assert PageProfile(page).page_type == 'state'
+
+
+def test_compressed_page_is_decompressed_once(tmp_path, monkeypatch):
+    import gzip
+
+    import query_File
+
+    path = tmp_path / 'page.html.gz'
+    path.write_bytes(gzip.compress(generate_page(50, 'itembox').encode('utf-8')))
+    opens = []
+
+    def counting_open(*args, **kwargs):
+        opens.append(args[0])
+        return gzip.open(*args, **kwargs)
+
+    monkeypatch.setitem(query_File.COMPRESSION_OPENERS, '.gz', counting_open)
+    cache = query_File.ParseCache(str(tmp_path / 'cache.sqlite'))
+    parser = query_File.EnhancedOLXParser(str(path), diagnostics=False, cache=cache)
+    assert len(parser.parse_html_file()) == 50
+    assert len(opens) == 1
+
+
+def test_page_states_come_from_scripts_only():
+    text = (
+        '<html><head><script src="/app.js"></script>'
+        '<script id="__NEXT_DATA__" type="application/json">{"props": {"page": 1}}</script>'
+        '</head><body><pre>window.__INITIAL_STATE__ = {"docs": true};</pre>'
+        '<SCRIPT>window.__INITIAL_STATE__ = {"states": {"items": {}}};</SCRIPT></body></html>'
+    )
+    assert list(iter_page_states(text)) == [{'props': {'page': 1}}, {'states': {'items': {}}}]
+
+
+def test_compressed_page_streams_without_holding_the_page(tmp_path, monkeypatch):
+    import gzip
+
+    import query_File
+
+    path = tmp_path / 'page.html.gz'
+    path.write_bytes(gzip.compress(generate_page(50, 'itembox').encode('utf-8')))
+
+    def no_buffer(self):
+        raise AssertionError("streaming decompressed the whole page")
+
+    monkeypatch.setattr(query_File.CompressedPageSource, 'buffer', property(no_buffer))
+    parser = query_File.EnhancedOLXParser(str(path), diagnostics=False, streaming=True)
+    assert len(parser.parse_html_file()) == 50
@@ -0,0 +1,25 @@
+import json
+
+from query_File import find_next_page_url, run_batch
+
+
+def test_next_page_url_is_the_first_cursor():
+    data = {
+        'metadata': {'next_page_url': '/api/search?page=2'},
+        'widgets': [{'next_page_url': '/api/widgets?page=2'}],
+    }
+    assert find_next_page_url(data) == '/api/search?page=2'
+    assert find_next_page_url([{'nextPage': '/a?page=2'}, {'nextPage': '/b?page=2'}]) == '/a?page=2'
+
+
+def test_follows_pages_of_several_urls(stand_in_server, tmp_path):
+    base = stand_in_server()
+    prefix = str(tmp_path / 'batch')
+    errors = run_batch([f"{base}/itembox-20.html", f"{base}/state-20.html"], workers=1,
+                       output_prefix=prefix, follow_pages=5,
+                       fetch_options={'per_host_rate': 0, 'cache_path': str(tmp_path / 'fetch.sqlite')})
+    assert errors == {}
+    with open(f'{prefix}.jsonl', encoding='utf-8') as f:
+        listings = [json.loads(line) for line in f]
+    # 20 ads on each page and 20 on each of the two search API pages, shared by both pages
+    assert len(listings) == 60
@@ -0,0 +1,24 @@
+import pytest
+
+from benchmark import generate_page
+from query_File import EnhancedOLXParser, SnapshotStore
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_superset_save_reuses_earlier_cards(tmp_path, streaming):
+    first = tmp_path / 'first.html'
+    first.write_text(generate_page(20, 'itembox'), encoding='utf-8')
+    later = tmp_path / 'later.html'
+    later.write_text(generate_page(30, 'itembox'), encoding='utf-8')
+    snapshots = SnapshotStore(str(tmp_path / 'snapshots.sqlite'))
+
+    EnhancedOLXParser(str(first), diagnostics=False, snapshots=snapshots,
+                      streaming=streaming).parse_html_file()
+    parser = EnhancedOLXParser(str(later), diagnostics=False, snapshots=snapshots, streaming=streaming)
+    listings = [dict(listing) for listing in parser.parse_html_file()]
+    full = [dict(listing) for listing in
+            EnhancedOLXParser(str(later), diagnostics=False, streaming=streaming).parse_html_file()]
+
+    assert parser.reused_cards == 20
+    assert len(listings) == 30
+    assert listings == full
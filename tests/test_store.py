@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from query_File import ListingStore
+
+
+def ad(price, ad_id='1700000001'):
+    return {'title': 'Car cover for Swift', 'price': price, 'location': 'Kothrud, Pune',
+            'date': 'Today', 'link': f'https://www.olx.in/item/car-cover-iid-{ad_id}',
+            'image_url': 'N/A', 'seller': 'N/A'}
+
+
+def test_older_scrape_does_not_overwrite_newer_fields(tmp_path):
+    with ListingStore(str(tmp_path / 'store.sqlite')) as store:
+        store.upsert([ad('₹ 900')], datetime(2024, 3, 1))
+        store.upsert([ad('₹ 1,200')], datetime(2024, 1, 1))
+        row = store.conn.execute(
+            'SELECT price, first_seen, last_seen, times_seen FROM listings').fetchone()
+        assert row == ('₹ 900', '2024-01-01T00:00:00', '2024-03-01T00:00:00', 2)
+        assert store.price_history('1700000001') == [('2024-03-01T00:00:00', '₹ 900', 90000)]
+
+        store.upsert([ad('₹ 800')], datetime(2024, 4, 1))
+        assert store.price_history('1700000001')[-1] == ('2024-04-01T00:00:00', '₹ 800', 80000)
+
+
+def test_repeated_ad_on_one_page_is_one_sighting(tmp_path):
+    with ListingStore(str(tmp_path / 'store.sqlite')) as store:
+        assert store.upsert([ad('₹ 900'), ad('₹ 900')], datetime(2024, 3, 1)) == 1
+        assert store.conn.execute('SELECT times_seen FROM listings').fetchone() == (1,)
+
+
+def test_field_projection_is_not_stored(tmp_path):
+    import pytest
+    from query_File import main, run_batch
+    with pytest.raises(SystemExit):
+        main([str(tmp_path), '--fields', 'title,link', '--store', str(tmp_path / 'store.sqlite')])
+    with pytest.raises(ValueError):
+        run_batch([str(tmp_path)], fields=('title', 'link'), store_path=str(tmp_path / 'store.sqlite'))
+    assert not (tmp_path / 'store.sqlite').exists()
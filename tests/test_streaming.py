@@ -0,0 +1,41 @@
+import re
+
+from benchmark import generate_page
+from query_File import EnhancedOLXParser
+
+
+def parse(content, **options):
+    parser = EnhancedOLXParser('page.html', diagnostics=False, content=content, **options)
+    return [dict(listing) for listing in parser.parse_html_file()]
+
+
+def test_streaming_keeps_state_listings_first():
+    html = generate_page(40, 'itembox', state=True)
+    # Move the page state after the cards and let its prices differ, so the
+    # order decides which duplicate survives
+    script = re.search(r'<script>window\.__INITIAL_STATE__.*?</script>', html).group()
+    html = html.replace(script, '').replace('</body>', script.replace('₹ ', 'Rs ') + '</body>')
+    content = html.encode('utf-8')
+
+    full_tree = parse(content, coverage_threshold=None)
+    assert full_tree[0]['price'].startswith('Rs ')
+    assert parse(content, streaming=True) == full_tree
+
+
+def test_streaming_yields_cards_before_the_page_ends(monkeypatch):
+    from query_File import PageSource
+    read = []
+    iter_text = PageSource.iter_text
+
+    def recording_iter_text(self, chunk_size=4096):
+        for chunk in iter_text(self, 4096):
+            read.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr(PageSource, 'iter_text', recording_iter_text)
+    content = generate_page(400, 'itembox').encode('utf-8')
+    parser = EnhancedOLXParser('page.html', diagnostics=False, content=content, streaming=True)
+    listings = parser.iter_streamed_listings()
+    next(listings)
+    assert sum(read) < len(content) / 2
+    assert len(list(listings)) == 399
@@ -0,0 +1,63 @@
+from bs4 import BeautifulSoup
+
+from query_File import TEMPLATE_SAMPLE_SIZE, CardTemplate, SelectorPlan, element_path, follow_path
+
+
+def cards_of(html):
+    return BeautifulSoup(html, 'html.parser').find_all('div', class_='card')
+
+
+def card(title, date=''):
+    return (f'<div class="card"><span class="price">₹ 100</span><span class="price">₹ 200</span>'
+            f'<h3 class="title">{title}</h3><span class="date">{date}</span></div>')
+
+
+def test_field_empty_in_samples_is_read_when_present():
+    cards = cards_of(''.join(card(f"Cover {i}") for i in range(TEMPLATE_SAMPLE_SIZE))
+                     + card("Cover late", date="Today"))
+    plan = SelectorPlan()
+    templates = CardTemplate.for_cards(cards, plan)
+    assert templates[-1] is not None
+    assert templates[-1].extract(cards[0], plan)['date'] == 'N/A'
+    assert templates[-1].extract(cards[-1], plan)['date'] == 'Today'
+
+
+def test_templates_are_kept_per_selector_plan():
+    cards = cards_of(''.join(card(f"Cover {i}") for i in range(TEMPLATE_SAMPLE_SIZE)))
+    default = CardTemplate.for_cards(cards, SelectorPlan())[0]
+    custom_plan = SelectorPlan({'title': ['.price']})
+    custom = CardTemplate.for_cards(cards, custom_plan)[0]
+    assert custom is not default
+    assert custom.extract(cards[0], custom_plan)['title'] == '₹ 100'
+
+
+def test_element_path_tells_identical_siblings_apart():
+    root = BeautifulSoup('<div><i>x</i><i>x</i></div>', 'html.parser').div
+    second = root.find_all('i')[1]
+    assert element_path(root, second) == ((1, 'i'),)
+    assert follow_path(root, element_path(root, second)) is second
+
+
+def test_shared_plans_are_keyed_by_selectors():
+    plan = SelectorPlan.shared_for({'seller': ['.seller-name']})
+    assert SelectorPlan.shared_for({'seller': ['.seller-name']}) is plan
+    other = SelectorPlan.shared_for({'seller': ['.profile-name']})
+    assert other is not plan and other.signature != plan.signature
+
+
+def test_earlier_selector_with_text_wins_over_the_learned_one(tmp_path):
+    from query_File import EnhancedOLXParser
+
+    def titled_card(title, h3):
+        return (f'<div class="card"><a href="/item/ad-iid-{h3}"><span data-aut-id="itemTitle">{title}</span>'
+                f'<h3>H3 title {h3}</h3><span class="price">₹ 100</span></a></div>')
+
+    cards = ''.join(titled_card('', i) for i in range(6)) + titled_card('Real title', 99)
+    html_file = tmp_path / 'page.html'
+    html_file.write_text(f'<html><body>{cards}</body></html>', encoding='utf-8')
+    titles = {}
+    for learn in (True, False):
+        parser = EnhancedOLXParser(str(html_file), diagnostics=False, learn_templates=learn)
+        titles[learn] = [listing['title'] for listing in parser.parse_html_file()]
+    assert 'Real title' in titles[True]
+    assert titles[True] == titles[False]